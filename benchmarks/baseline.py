@@ -0,0 +1,47 @@
+# baseline.py
+# Baseline files and regression checks shared by the benchmark scripts:
+# --baseline FILE --save-baseline stores a run, later runs with --baseline
+# FILE fail when a timing is more than --threshold times the stored one.
+import json
+import sys
+
+
+def add_arguments(ap):
+    ap.add_argument("--baseline", help="JSON file with baseline results")
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="write this run to --baseline instead of comparing")
+    ap.add_argument("--threshold", type=float, default=1.5)
+    ap.add_argument("--floor", type=float, default=1e-3,
+                    help="ignore timings of at most this many seconds")
+
+
+def regressions(times, baseline, threshold, floor=0.0):
+    """
+    Messages for every timing slower than threshold * baseline. Timings of
+    at most floor seconds in this run are timer noise and never fail.
+    """
+    found = []
+    for name, t in sorted(times.items()):
+        b = baseline.get(name)
+        if b is not None and t > threshold * b and t > floor:
+            found.append("{0}: {1:.4f}s > {2} x baseline {3:.4f}s".format(name, t, threshold, b))
+    return found
+
+
+def check(result, args, times, found=()):
+    """
+    Save result to args.baseline (with --save-baseline), or compare the
+    timings times(result) against times(baseline) and print the
+    regressions, after the ones already found. Returns the exit status.
+    """
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(json.dumps(result, indent=2, sort_keys=True) + "\n")
+        return 0
+    found = list(found)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found += regressions(times(result), times(json.load(f)), args.threshold, args.floor)
+    for msg in found:
+        print("REGRESSION:", msg, file=sys.stderr)
+    return 1 if found else 0
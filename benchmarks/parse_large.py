@@ -0,0 +1,81 @@
+# parse_large.py
+# Parse-time scaling of integralcalculator on generated polynomials.
+# For each term count N the string "c0 + c1*x^1 - c2*x^2 + ..." is pushed
+# through tokenize -> shunting_yard -> rpn_to_sympy, with and without the
+# large-expression mode. The growth exponent is the log-log slope of time
+# against N; the run fails when the large mode's slope exceeds --max-slope.
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import integralcalculator as ic
+
+
+def polynomial(n_terms):
+    parts = ["1"]
+    for i in range(1, n_terms):
+        parts.append("{0} {1}*x^{2}".format("-" if i % 3 == 0 else "+", i % 97 + 1, i))
+    return " ".join(parts)
+
+
+def time_parse(expr, large, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        # start cold so earlier sizes don't pre-build this one's terms
+        ic.sp.core.cache.clear_cache()
+        t0 = time.perf_counter()
+        ic.rpn_to_sympy(ic.shunting_yard(ic.tokenize(expr)), large=large)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def slope(ns, ts):
+    # least-squares slope of log(t) against log(n)
+    xs = [math.log(n) for n in ns]
+    ys = [math.log(t) for t in ts]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return (sum((x - mx) * (y - my) for x, y in zip(xs, ys)) /
+            sum((x - mx) ** 2 for x in xs))
+
+
+def run(sizes, binary_max=1000, repeat=3):
+    result = {"sizes": sizes, "large_s": [], "binary_s": []}
+    for n in sizes:
+        expr = polynomial(n)
+        result["large_s"].append(time_parse(expr, True, repeat))
+        # the binary path is quadratic; stop timing it past binary_max terms
+        result["binary_s"].append(time_parse(expr, False, repeat) if n <= binary_max else None)
+    result["large_slope"] = slope(sizes, result["large_s"])
+    timed = [(n, t) for n, t in zip(sizes, result["binary_s"]) if t is not None]
+    if len(timed) > 1:
+        result["binary_slope"] = slope(*zip(*timed))
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="large-expression parse scaling benchmark")
+    ap.add_argument("--sizes", default="500,1000,2000,4000,8000",
+                    help="comma-separated term counts")
+    ap.add_argument("--binary-max", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-slope", type=float, default=1.3,
+                    help="fail if large-mode time grows faster than N**max_slope")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    result = run(sizes, args.binary_max, args.repeat)
+    print(json.dumps(result, indent=2))
+    if result["large_slope"] > args.max_slope:
+        print("REGRESSION: large-mode parse slope {0:.2f} > {1}".format(
+            result["large_slope"], args.max_slope), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
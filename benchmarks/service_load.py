@@ -0,0 +1,126 @@
+# service_load.py
+# Throughput / latency of service.py under concurrent load, on localhost.
+# Starts a SolveService on a temporary Unix socket, then runs --clients
+# concurrent connections that each send --requests integrations drawn from
+# a small corpus (so identical requests overlap and get coalesced), plus a
+# share of enmpy solves and of slow integrations that run out of their
+# --slow-timeout budget (these must come back as "timeout" results without
+# breaking the workers). Prints JSON with requests/s and latency
+# percentiles; --cold N also times N fresh-interpreter integrations for
+# comparison. Fails when p95 latency exceeds --max-p95 (if given).
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import service
+
+EXPRS = ["x^2 + 1", "x*e^(2*x)", "e^x*sin(x)", "x^3*cos(x)", "1/x", "sqrt(x)",
+         "x*cos(x)^2", "tan(x)", "(x^2 + 1)*e^(3*x)", "sin(2*x) + cos(3*x)"]
+SOLVE = {"problem": "coulomb.force", "qA": 1e-6, "qB": 2e-6, "r": 0.1}
+SLOW = "exp(x^3)*sin(x^2)*ln(x)"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def client(path, requests, solve_share, slow_share, slow_timeout, seed, latencies,
+                 timeouts):
+    rng = random.Random(seed)
+    c = await service.Client(path).connect()
+    try:
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            roll = rng.random()
+            if roll < solve_share:
+                await c.call("solve", **SOLVE)
+            elif roll < solve_share + slow_share:
+                out = await c.call("integrate", expr=SLOW, timeout=slow_timeout)
+                timeouts.append(out["status"] == "timeout")
+            else:
+                await c.call("integrate", expr=rng.choice(EXPRS))
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        await c.close()
+
+
+async def load(clients, requests, workers, max_queue, solve_share, slow_share=0.0,
+               slow_timeout=0.5):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solve.sock")
+        svc = service.SolveService(workers, max_queue)
+        t0 = time.perf_counter()
+        await svc.start(path)
+        startup = time.perf_counter() - t0
+        latencies = []
+        timeouts = []
+        t0 = time.perf_counter()
+        await asyncio.gather(*[client(path, requests, solve_share, slow_share, slow_timeout, i,
+                                      latencies, timeouts) for i in range(clients)])
+        wall = time.perf_counter() - t0
+        stats = svc.stats()
+        await svc.close()
+    return {"clients": clients, "requests": len(latencies), "workers": svc.workers,
+            "startup_s": startup, "wall_s": wall, "throughput_rps": len(latencies) / wall,
+            "p50_s": percentile(latencies, 50), "p95_s": percentile(latencies, 95),
+            "p99_s": percentile(latencies, 99), "coalesced": stats["coalesced"],
+            "timeouts": sum(timeouts), "slow": len(timeouts), "errors": stats["errors"],
+            "restarts": stats["restarts"]}
+
+
+def cold(n):
+    # one fresh interpreter per integration, as a client without the service pays
+    code = "import integralcalculator as ic; ic.integrate_string_with_steps('x*e^(2*x)')"
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        times.append(time.perf_counter() - t0)
+    return percentile(times, 50)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="solve service load benchmark")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=50, help="requests per client")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--max-queue", type=int, default=service.MAX_QUEUE)
+    ap.add_argument("--solve-share", type=float, default=0.2,
+                    help="fraction of requests that are enmpy solves")
+    ap.add_argument("--slow-share", type=float, default=0.02,
+                    help="fraction of requests that are slow integrations with a time budget")
+    ap.add_argument("--slow-timeout", type=float, default=0.5)
+    ap.add_argument("--cold", type=int, default=0,
+                    help="also time this many cold single-process integrations")
+    ap.add_argument("--max-p95", type=float, help="fail if p95 latency exceeds this (s)")
+    args = ap.parse_args(argv)
+
+    result = asyncio.run(load(args.clients, args.requests, args.workers,
+                              args.max_queue, args.solve_share, args.slow_share,
+                              args.slow_timeout))
+    if args.cold:
+        result["cold_p50_s"] = cold(args.cold)
+    print(json.dumps(result, indent=2))
+    if result["errors"] or result["restarts"]:
+        print("REGRESSION: {0} errors, {1} pool restarts".format(result["errors"], result["restarts"]),
+              file=sys.stderr)
+        return 1
+    if args.max_p95 is not None and result["p95_s"] > args.max_p95:
+        print("REGRESSION: p95 latency {0:.4f}s > {1}s".format(result["p95_s"], args.max_p95),
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
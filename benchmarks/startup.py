@@ -0,0 +1,70 @@
+# startup.py
+# Start-up benchmark for integralcalculator.py.
+# Every sample runs in a fresh interpreter and records:
+#   import_s       time to import integralcalculator
+#   parse_s        first tokenize + shunting_yard call
+#   first_call_s   first integrate_string_with_steps call (includes SymPy import)
+#   sympy_eager    whether SymPy was loaded before it was needed (must be False)
+# Results are printed as JSON; with --baseline the run fails when a median
+# is more than --threshold times slower than the stored one.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import baseline
+
+_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import integralcalculator as ic
+t1 = time.perf_counter()
+ic.shunting_yard(ic.tokenize("3*x^2 + 2*x*e^(2*x) - sin(x)/x"))
+t2 = time.perf_counter()
+eager = "sympy" in sys.modules
+ic.integrate_string_with_steps("x^2 + 1")
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "parse_s": t2 - t1,
+                  "first_call_s": t3 - t2, "sympy_eager": eager}))
+"""
+
+METRICS = ("import_s", "parse_s", "first_call_s")
+
+
+def sample():
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(repeat=5):
+    samples = [sample() for _ in range(repeat)]
+    result = {m: statistics.median(s[m] for s in samples) for m in METRICS}
+    result["sympy_eager"] = any(s["sympy_eager"] for s in samples)
+    result["repeat"] = repeat
+    return result
+
+
+def _times(result):
+    return {m: result[m] for m in METRICS if m in result}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="integralcalculator start-up benchmark")
+    ap.add_argument("--repeat", type=int, default=5)
+    baseline.add_arguments(ap)
+    args = ap.parse_args(argv)
+
+    result = run(args.repeat)
+    print(json.dumps(result, indent=2))
+    found = ["SymPy was imported before the first integration"] if result["sympy_eager"] else []
+    return baseline.check(result, args, _times, found)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
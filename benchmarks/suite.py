@@ -0,0 +1,129 @@
+# suite.py
+# Benchmark suite for the integrator and the field solvers.
+# Areas:
+#   integrate  corpus of integrands grouped by the rule class they exercise
+#   parse      tokenize -> shunting_yard -> rpn_to_sympy on large polynomials
+#   fields     Coulomb / Gauss computations (enmpy.py, gauss.py) at increasing N
+# Every case is timed as the best of --repeat runs. Results are printed (or
+# written to --output) as JSON; with --baseline the run fails when a case is
+# more than --threshold times slower than the stored one.
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import baseline
+
+# rule class -> integrands
+CORPUS = {
+    "power": ["x^2", "3*x^5 - 2*x^3 + x", "sqrt(x)", "1/x", "4*x^-3"],
+    "poly_exp": ["x*e^(2*x)", "x^3*e^(-x)", "(x^2 + 1)*e^(3*x)", "x^6*e^(x/2)"],
+    "exp_trig": ["e^x*sin(x)", "e^(2*x)*cos(3*x)", "e^(-x)*sin(4*x)"],
+    "fallback": ["x*cos(x)^2", "tan(x)", "x*atan(x)", "ln(x)^2"],
+    "large_sum": [" + ".join("{0}*x^{1}".format(i % 7 + 1, i) for i in range(60)),
+                  " + ".join("sin({0}*x)".format(i + 1) for i in range(30))],
+}
+
+PARSE_SIZES = (500, 2000, 8000)
+FIELD_SIZES = (100, 1000, 10000)
+
+
+def best_of(fn, repeat, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_integrate(repeat):
+    import integralcalculator as ic
+
+    def cold():
+        # SymPy's own cache would turn every repeat into a lookup
+        ic.sp.core.cache.clear_cache()
+
+    # import SymPy and build the rule tables outside the timed region
+    ic.integrate_string_with_steps("x", cache=False)
+    cases = {}
+    for group, exprs in CORPUS.items():
+        for i, expr in enumerate(exprs):
+            cases["integrate/{0}/{1}".format(group, i)] = best_of(
+                lambda: ic.integrate_string_with_steps(expr, cache=False), repeat, cold)
+    return cases
+
+
+def bench_parse(repeat):
+    import parse_large
+    return {"parse/large/{0}".format(n): parse_large.time_parse(parse_large.polynomial(n), True, repeat)
+            for n in PARSE_SIZES}
+
+
+def bench_fields(repeat):
+    import numpy as np
+    import coulomb
+    import enmpy
+    import gauss
+
+    rng = np.random.default_rng(0)
+    cases = {}
+    for n in FIELD_SIZES:
+        q = rng.uniform(-1e-6, 1e-6, n)
+        pos = rng.uniform(-1, 1, (n, 2))
+        charges = [(q[i], pos[i, 0], pos[i, 1]) for i in range(n)]
+        cases["fields/coulomb_net_force/{0}".format(n)] = best_of(
+            lambda: enmpy.coulomb_net_force(1e-6, 5.0, 5.0, charges), repeat)
+        cases["fields/net_forces/{0}".format(n)] = best_of(
+            lambda: coulomb.net_forces(q, pos, q, pos), repeat)
+        records = [{"problem": "gauss.sphere.inside_power", "a": 1e-6, "n": 2, "r": 0.1 + i % 10}
+                   for i in range(n)]
+        cases["fields/gauss_sphere_batch/{0}".format(n)] = best_of(
+            lambda: list(enmpy.solve_stream(records)), repeat)
+        radii = np.linspace(0, 3, 100 * n)
+        cases["fields/gauss_profile/{0}".format(100 * n)] = best_of(
+            lambda: gauss.field_profile(lambda s: 1e-6 * s * s, radii, R=2.0), repeat)
+    return cases
+
+
+AREAS = {"integrate": bench_integrate, "parse": bench_parse, "fields": bench_fields}
+
+
+def run(areas=tuple(AREAS), repeat=3):
+    cases = {}
+    for area in areas:
+        cases.update(AREAS[area](repeat))
+    return {"repeat": repeat, "cases": cases}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="integrator and field solver benchmark suite")
+    ap.add_argument("--areas", default=",".join(AREAS),
+                    help="comma-separated subset of: " + ", ".join(AREAS))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--output", help="write the JSON results here as well")
+    baseline.add_arguments(ap)
+    args = ap.parse_args(argv)
+
+    areas = [a for a in args.areas.split(",") if a]
+    unknown = [a for a in areas if a not in AREAS]
+    if unknown:
+        ap.error("unknown area(s): " + ", ".join(unknown))
+    result = run(areas, args.repeat)
+    text = json.dumps(result, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return baseline.check(result, args, lambda r: r.get("cases", {}))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
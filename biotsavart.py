@@ -0,0 +1,151 @@
+# biotsavart.py
+# Magnetic field of current-carrying wire paths (Biot-Savart law).
+# A path is a polyline of 3D points; every straight segment contributes its
+# exact finite-segment field, summed over (field point, segment) pairs in
+# bounded NumPy passes. The closed forms from the enmpy.py notes (long
+# wire, loop, arc, solenoid, thick wire) are reference formulas for those
+# ideal geometries and for checking the engine; field() never dispatches
+# to them.
+import math
+
+import numpy as np
+
+mu0 = 4e-7 * math.pi    # Vacuum Permeability
+
+# (field point, segment) pairs evaluated per NumPy pass; keeps the
+# temporary M x S x 3 arrays bounded for long paths and dense grids
+CHUNK_PAIRS = 1 << 20
+
+
+# ---------- Closed forms ----------
+# Only valid at the points noted (center, axis, far from the ends);
+# use field() / path_field() anywhere else.
+def wire_field(I, r):
+    # B = u0 I / (2 pi r), long straight wire
+    return mu0 * I / (2 * math.pi * r)
+
+
+def thick_wire_inside(I, a, r):
+    # B = u0 I r / (2 pi a^2), inside a long wire of radius a
+    return mu0 * I * r / (2 * math.pi * a * a)
+
+
+def arc_center_field(I, R, theta):
+    # B = u0 I theta / (4 pi R) at the center of an arc of angle theta
+    return mu0 * I * theta / (4 * math.pi * R)
+
+
+def loop_center_field(I, R):
+    # B = u0 I / (2 R) at the center of a full loop
+    return mu0 * I / (2 * R)
+
+
+def loop_axis_field(I, R, z):
+    # B = u0 I R^2 / (2 (z^2 + R^2)^(3/2)) on the axis of a loop
+    return mu0 * I * R * R / (2 * (z * z + R * R) ** 1.5)
+
+
+def solenoid_field(n, I):
+    # B = u0 n I inside an ideal solenoid, n turns per length
+    return mu0 * n * I
+
+
+def solenoid_axis_field(n, I, R, L, z):
+    # finite solenoid of length L centered at z = 0, on its axis
+    zp, zm = z + L / 2, z - L / 2
+    return mu0 * n * I / 2 * (zp / (zp * zp + R * R) ** 0.5 - zm / (zm * zm + R * R) ** 0.5)
+
+
+# ---------- Paths ----------
+def _as3d(a):
+    a = np.asarray(a, dtype=float)
+    a = a.reshape(-1, a.shape[-1]) if a.ndim > 1 else a.reshape(1, -1)
+    if a.shape[1] == 2:
+        a = np.hstack([a, np.zeros((len(a), 1))])
+    return a
+
+
+def line_path(p0, p1, n=1):
+    """n segments from p0 to p1."""
+    t = np.linspace(0, 1, n + 1)[:, None]
+    return (1 - t) * _as3d(p0) + t * _as3d(p1)
+
+
+def arc_path(R, theta, n=64, center=(0, 0, 0)):
+    """Arc of radius R from angle 0 to theta in the z = center[2] plane."""
+    t = np.linspace(0, theta, n + 1)
+    return _as3d(center) + np.stack([R * np.cos(t), R * np.sin(t), np.zeros_like(t)], axis=1)
+
+
+def loop_path(R, n=256, center=(0, 0, 0)):
+    """Closed loop of radius R around the z axis (first point repeated)."""
+    return arc_path(R, 2 * math.pi, n, center)
+
+
+def helix_path(R, length, turns, n_per_turn=64):
+    """Solenoid winding along z, centered at the origin."""
+    t = np.linspace(0, 2 * math.pi * turns, int(n_per_turn * turns) + 1)
+    z = np.linspace(-length / 2, length / 2, len(t))
+    return np.stack([R * np.cos(t), R * np.sin(t), z], axis=1)
+
+
+def segments(path, closed=False):
+    """(starts, ends) of the straight segments of a polyline path."""
+    path = _as3d(path)
+    if closed:
+        path = np.vstack([path, path[:1]])
+    return path[:-1], path[1:]
+
+
+# ---------- Biot-Savart sum ----------
+def field(starts, ends, I, points, chunk_pairs=CHUNK_PAIRS):
+    """
+    B at field points from straight current segments.
+    starts, ends: segment end points, shape (S, 3) (or (S, 2) in the xy plane)
+    I: current, scalar or one per segment, flowing from start to end
+    points: field points, shape (..., 3) (or (..., 2))
+    returns B shaped like points (always 3 components). Points that lie on
+    a segment get NaN.
+    Each segment uses the exact finite-segment result
+      B = u0 I / (4 pi) * (a x b) (|a| + |b|) / (|a| |b| (|a| |b| + a.b))
+    with a, b the segment ends relative to the field point.
+    """
+    A = _as3d(starts)
+    Bn = _as3d(ends)
+    n = len(A)
+    I = np.broadcast_to(np.asarray(I, dtype=float), (n,))
+    pts = np.asarray(points, dtype=float)
+    shape = pts.shape[:-1] if pts.ndim > 1 else ()
+    P = _as3d(pts)
+    m = len(P)
+    out = np.zeros((m, 3))
+    on = np.zeros(m, dtype=bool)
+    block = max(1, min(n, chunk_pairs))
+    tile = max(1, chunk_pairs // block)
+    for ps in range(0, m, tile):
+        pe = min(ps + tile, m)
+        p = P[ps:pe, None, :]
+        for ss in range(0, n, block):
+            se = min(ss + block, n)
+            a = A[None, ss:se] - p
+            b = Bn[None, ss:se] - p
+            la = np.sqrt(np.einsum("tsk,tsk->ts", a, a))
+            lb = np.sqrt(np.einsum("tsk,tsk->ts", b, b))
+            lab = la * lb
+            den = lab * (lab + np.einsum("tsk,tsk->ts", a, b))
+            # on the segment a and b are antiparallel (or one is zero)
+            hit = den <= 1e-12 * lab * lab
+            with np.errstate(divide="ignore", invalid="ignore"):
+                w = np.where(hit, 0.0, I[None, ss:se] * (la + lb) / den)
+            out[ps:pe] += np.einsum("ts,tsk->tk", w, np.cross(a, b))
+            on[ps:pe] |= hit.any(axis=1)
+            del a, b, la, lb, lab, den, w
+    out *= mu0 / (4 * math.pi)
+    out[on] = np.nan
+    return out.reshape(shape + (3,))
+
+
+def path_field(path, I, points, closed=False, chunk_pairs=CHUNK_PAIRS):
+    """B at points from current I along a polyline path (see field)."""
+    starts, ends = segments(path, closed)
+    return field(starts, ends, I, points, chunk_pairs)
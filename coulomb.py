@@ -0,0 +1,408 @@
+# coulomb.py
+# Coulomb's Law net-force engine shared by the enmpy menu and scripts.
+# Uses NumPy when it is available and falls back to plain Python lists
+# (e.g. on the TI 84 Plus CE Python app, which has no NumPy).
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+k = 9e9         # Coulomb Constant
+
+# Number of (test charge, source charge) pairs evaluated per NumPy pass;
+# keeps the temporary M x N arrays bounded for large problem sets.
+CHUNK_PAIRS = 1 << 22
+
+
+# ---------- Kernels ----------
+def _force_kernel(q, src, at, sqrt):
+    # k q d / r^3 (per unit test charge) from charge q at src, at point at;
+    # src and at are coordinate tuples, (x, y) or (x, y, z), of floats or of
+    # NumPy arrays that broadcast. Coincident pairs are dropped (same is
+    # True / 1 there) without branching, so the same code runs on both.
+    # returns (Ex, Ey[, Ez], same)
+    d = [a - b for a, b in zip(at, src)]
+    r2 = 0.0
+    for c in d:
+        r2 = r2 + c * c
+    same = r2 == 0
+    r2 = r2 + same
+    w = k * q * (1 - same) / (r2 * sqrt(r2))
+    return tuple(w * c for c in d) + (same,)
+
+
+def _potential_kernel(q, src, at, sqrt):
+    r2 = 0.0
+    for a, b in zip(at, src):
+        r2 = r2 + (a - b) * (a - b)
+    same = r2 == 0
+    return k * q * (1 - same) / sqrt(r2 + same), same
+
+
+def _accumulate(kernel, width, rows, at):
+    # no-NumPy sum of the kernel's first width outputs over (q, src) rows,
+    # and whether any of them sits at the point
+    totals = [0.0] * width
+    hit = False
+    for q, src in rows:
+        out = kernel(q, src, at, math.sqrt)
+        for j in range(width):
+            totals[j] += out[j]
+        hit = hit or out[width]
+    return totals, bool(hit)
+
+
+# ---------- Net forces ----------
+def net_forces(q, pos, tq, tpos, chunk_pairs=CHUNK_PAIRS, theta=None):
+    """
+    Net Coulomb force on every test charge from every source charge.
+    q: source charges, shape (N,)
+    pos: source positions, shape (N, d) (d = 2 for the menu, 3 also works)
+    tq: test charges, shape (M,)
+    tpos: test charge positions, shape (M, d)
+    returns (F, coincident):
+      F is the (M, d) array of net force vectors,
+      coincident is an (M,) bool mask of test charges that share a point
+      with at least one source charge; those pairs are left out of F.
+    theta: if given, use the Barnes-Hut approximation with this opening
+      angle (see barneshut.py); small charge sets still use the exact sum.
+    Without NumPy, F and coincident are plain lists.
+    """
+    if theta is not None and np is not None:
+        from barneshut import net_forces as tree_forces
+        return tree_forces(q, pos, tq, tpos, theta=theta)
+    if np is None:
+        F = []
+        coincident = []
+        for tc, tp in zip(tq, tpos):
+            E, same = _accumulate(_force_kernel, len(tp), zip(q, pos), tuple(tp))
+            F.append([tc * c for c in E])
+            coincident.append(same)
+        return F, coincident
+    q = np.asarray(q, dtype=float).reshape(-1)
+    tq = np.asarray(tq, dtype=float).reshape(-1)
+    pos = np.asarray(pos, dtype=float)
+    tpos = np.asarray(tpos, dtype=float)
+    if len(tq) == 0:
+        return np.zeros((0, pos.shape[-1] if pos.ndim == 2 else 2)), np.zeros(0, dtype=bool)
+    tpos = tpos.reshape(len(tq), -1)
+    F = np.zeros(tpos.shape)
+    coincident = np.zeros(len(tq), dtype=bool)
+    if len(q) == 0:
+        return F, coincident
+    pos = pos.reshape(len(q), -1)
+    if pos.shape[1] != tpos.shape[1]:
+        raise ValueError("source and test positions must have the same dimension")
+
+    src = tuple(pos.T)
+    step = max(1, chunk_pairs // len(q))
+    for start in range(0, len(tq), step):
+        stop = min(start + step, len(tq))
+        # rows are test charges, columns source charges
+        at = tuple(tpos[start:stop].T[:, :, None])
+        with np.errstate(invalid="ignore"):
+            out = _force_kernel(q, src, at, np.sqrt)
+        coincident[start:stop] = out[-1].any(axis=1)
+        for j, c in enumerate(out[:-1]):
+            F[start:stop, j] = tq[start:stop] * c.sum(axis=1)
+    return F, coincident
+
+
+def net_force(q, pos, tc, tpos):
+    """
+    Net force on a single test charge tc at tpos.
+    returns (F, coincident) with F a plain list of components.
+    """
+    F, coincident = net_forces(q, pos, [tc], [tpos])
+    return [float(c) for c in F[0]], bool(coincident[0])
+
+
+# ---------- Charge sets ----------
+class _Columns:
+    # fixed number of float columns that grow together, with spare capacity
+    # past the first _n entries: NumPy arrays, or stdlib array columns. The
+    # array backend only uses append, indexing and item assignment, which
+    # MicroPython's array (the TI-84 Python app) also has; array.pop does not
+    # exist there
+    def __init__(self, width, backend=None, typecode="d"):
+        if backend is None:
+            backend = "numpy" if np is not None else "array"
+        if backend not in ("numpy", "array"):
+            raise ValueError("backend must be 'numpy' or 'array'")
+        if backend == "numpy" and np is None:
+            raise ImportError("NumPy is not available")
+        self.backend = backend
+        self.typecode = typecode
+        self._n = 0
+        if backend == "numpy":
+            dtype = np.float32 if typecode == "f" else np.float64
+            self._cols = [np.empty(16, dtype=dtype) for _ in range(width)]
+        else:
+            from array import array
+            self._cols = [array(typecode) for _ in range(width)]
+
+    def __len__(self):
+        return self._n
+
+    def _index(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("index out of range")
+        return i
+
+    def _row(self, i):
+        i = self._index(i)
+        return tuple(float(c[i]) for c in self._cols)
+
+    def _append(self, values):
+        if self.backend == "numpy":
+            if self._n == len(self._cols[0]):
+                self._cols = [np.concatenate([c, np.empty_like(c)]) for c in self._cols]
+            for c, v in zip(self._cols, values):
+                c[self._n] = v
+        elif self._n == len(self._cols[0]):
+            for c, v in zip(self._cols, values):
+                c.append(v)
+        else:
+            for c, v in zip(self._cols, values):
+                c[self._n] = v
+        self._n += 1
+
+    def _extend(self, rows):
+        if self.backend == "array":
+            for row in rows:
+                self._append(row)
+            return
+        block = np.asarray(rows if isinstance(rows, np.ndarray) else list(rows),
+                           dtype=float).reshape(-1, len(self._cols))
+        need = self._n + len(block)
+        if need > len(self._cols[0]):
+            cap = max(need, 2 * len(self._cols[0]))
+            self._cols = [np.concatenate([c[:self._n], np.empty(cap - self._n, dtype=c.dtype)])
+                          for c in self._cols]
+        for j, c in enumerate(self._cols):
+            c[self._n:need] = block[:, j]
+        self._n = need
+
+    def _set(self, i, values):
+        i = self._index(i)
+        for c, v in zip(self._cols, values):
+            c[i] = v
+
+    def _pop(self, i, keep_order):
+        # the vacated last slot becomes spare capacity
+        i = self._index(i)
+        item = self._row(i)
+        last = self._n - 1
+        for c in self._cols:
+            if keep_order and self.backend == "numpy":
+                c[i:last] = c[i + 1:self._n]
+            elif keep_order:
+                for j in range(i, last):
+                    c[j] = c[j + 1]
+            else:
+                c[i] = c[last]
+        self._n -= 1
+        return item
+
+    def columns(self):
+        # NumPy views; array columns are copied only when they have spare room
+        if self.backend == "numpy" or len(self._cols[0]) > self._n:
+            return tuple(c[:self._n] for c in self._cols)
+        return tuple(self._cols)
+
+    def _rows(self):
+        # (c0[i], c1[i], ...) for every entry, without copying the columns
+        cols = self._cols
+        for i in range(self._n):
+            yield tuple(c[i] for c in cols)
+
+    @property
+    def nbytes(self):
+        if self.backend == "numpy":
+            return sum(c.nbytes for c in self._cols)
+        return (4 if self.typecode == "f" else 8) * sum(len(c) for c in self._cols)
+
+
+class ChargeSet(_Columns):
+    """
+    Growable set of 2D point charges stored as three columns (q, x, y)
+    instead of one object per charge. The columns are NumPy arrays when
+    NumPy is available and stdlib array('d') columns otherwise (24 bytes
+    per charge, or 12 with typecode "f"), so large sets fit in the TI-84's
+    RAM. Forces, fields and potentials are computed by the same kernels on
+    either backend: per column with NumPy, per charge with array.
+    """
+
+    def __init__(self, charges=(), backend=None, typecode="d"):
+        _Columns.__init__(self, 3, backend, typecode)
+        self.extend(charges)
+
+    def __getitem__(self, i):
+        return self._row(i)
+
+    def __setitem__(self, i, charge):
+        self._set(i, charge)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._row(i)
+
+    def add(self, q, x, y):
+        self._append((q, x, y))
+
+    def extend(self, charges):
+        self._extend(charges)
+
+    def pop(self, i=-1):
+        """Remove and return charge i as (q, x, y)."""
+        return self._pop(i, True)
+
+    def swap_pop(self, i=-1):
+        """
+        pop() in O(1): the last charge moves into slot i, so only the
+        order of the remaining charges changes.
+        """
+        return self._pop(i, False)
+
+    def clear(self):
+        _Columns.__init__(self, 3, self.backend, self.typecode)
+
+    def columns(self):
+        """(q, x, y) columns of the charges currently in the set."""
+        return _Columns.columns(self)
+
+    def _sum(self, kernel, width, tx, ty):
+        # sums of the kernel's first width outputs over all charges, and
+        # whether any charge sits at (tx, ty)
+        if self.backend == "numpy":
+            q, x, y = self.columns()
+            with np.errstate(invalid="ignore"):
+                out = kernel(q, (x, y), (tx, ty), np.sqrt)
+            return tuple(float(o.sum()) for o in out[:width]) + (bool(out[width].any()),)
+        totals, hit = _accumulate(kernel, width, ((r[0], r[1:]) for r in self._rows()), (tx, ty))
+        return tuple(totals) + (hit,)
+
+    def net_force(self, tc, tx, ty):
+        """(Fx, Fy, coincident) on test charge tc at (tx, ty)."""
+        Ex, Ey, same = self._sum(_force_kernel, 2, tx, ty)
+        return tc * Ex, tc * Ey, same
+
+    def field(self, tx, ty):
+        """(Ex, Ey, coincident) at (tx, ty)."""
+        return self._sum(_force_kernel, 2, tx, ty)
+
+    def potential(self, tx, ty):
+        """(V, coincident) at (tx, ty)."""
+        return self._sum(_potential_kernel, 1, tx, ty)
+
+
+# ---------- Incremental net force ----------
+class _Neumaier:
+    # compensated running sum; value() is the sum with the lost low bits
+    def __init__(self, total=0.0):
+        self.total = total
+        self.comp = 0.0
+
+    def add(self, v):
+        t = self.total + v
+        if abs(self.total) >= abs(v):
+            self.comp += (self.total - t) + v
+        else:
+            self.comp += (v - t) + self.total
+        self.total = t
+
+    def value(self):
+        return self.total + self.comp
+
+
+class NetForce:
+    """
+    Net force on one test charge, kept up to date as source charges are
+    added, changed or removed. Every charge's contribution is stored next
+    to it, so each edit is O(1): the old contribution is subtracted and
+    the new one added, with Neumaier compensated sums so long edit
+    sequences stay at full-recompute accuracy. Moving the test charge
+    recomputes every contribution in one vectorized pass.
+    Charges are numbered in insertion order; remove() moves the last
+    charge into the removed slot.
+    """
+
+    def __init__(self, tc, tx, ty, charges=(), backend=None, typecode="d"):
+        self.charges = ChargeSet(charges, backend, typecode)
+        # per-charge contribution (Fx, Fy per unit test charge, coincident)
+        self._contrib = _Columns(3, self.charges.backend, "d")
+        self.tc = tc
+        self.move_test(tx, ty)
+
+    def __len__(self):
+        return len(self.charges)
+
+    def _kernel(self, q, x, y):
+        return _force_kernel(q, (x, y), (self.tx, self.ty), math.sqrt)
+
+    def _apply(self, contrib, sign):
+        fx, fy, same = contrib
+        self._fx.add(sign * fx)
+        self._fy.add(sign * fy)
+        self._same += sign * int(same)
+
+    def add(self, q, x, y):
+        """Add a source charge; returns its index."""
+        contrib = self._kernel(q, x, y)
+        self.charges.add(q, x, y)
+        self._contrib._append(contrib)
+        self._apply(contrib, 1)
+        return len(self.charges) - 1
+
+    def remove(self, i):
+        """Remove charge i and return it as (q, x, y)."""
+        self._apply(self._contrib._row(i), -1)
+        self._contrib._pop(i, False)
+        return self.charges.swap_pop(i)
+
+    def update(self, i, q=None, x=None, y=None):
+        """Change charge i; arguments left as None keep their value."""
+        old = self.charges[i]
+        new = tuple(o if n is None else n for o, n in zip(old, (q, x, y)))
+        contrib = self._kernel(*new)
+        self._apply(self._contrib._row(i), -1)
+        self._apply(contrib, 1)
+        self.charges[i] = new
+        self._contrib._set(i, contrib)
+
+    def move_test(self, tx, ty, tc=None):
+        """Move the test charge (and optionally change it); full recompute."""
+        self.tx = tx
+        self.ty = ty
+        if tc is not None:
+            self.tc = tc
+        contrib = _Columns(3, self.charges.backend, "d")
+        if self.charges.backend == "numpy":
+            q, x, y = self.charges.columns()
+            with np.errstate(invalid="ignore"):
+                fx, fy, same = _force_kernel(q, (x, y), (tx, ty), np.sqrt)
+            contrib._extend(np.stack([fx, fy, same], axis=1))
+        else:
+            contrib._extend(self._kernel(qi, xi, yi) for qi, xi, yi in self.charges._rows())
+        self._contrib = contrib
+        if contrib.backend == "numpy":
+            # NumPy means CPython, which has math.fsum
+            fx, fy, same = contrib.columns()
+            self._fx = _Neumaier(math.fsum(fx))
+            self._fy = _Neumaier(math.fsum(fy))
+            self._same = int(same.sum())
+        else:
+            # the calculator's math module has no fsum: compensated loop
+            self._fx = _Neumaier()
+            self._fy = _Neumaier()
+            self._same = 0
+            for row in contrib._rows():
+                self._apply(row, 1)
+
+    def net_force(self):
+        """(Fx, Fy, coincident) on the test charge."""
+        return self.tc * self._fx.value(), self.tc * self._fy.value(), self._same > 0
@@ -40,21 +40,229 @@
 
 import sys
 import math
+from coulomb import ChargeSet, NetForce
 
 k = 9e9         # Coulomb Constant
 vps = 8.85e-12  # Vacuum Permittivity of Space
 pi = 3.14159265358979
-print("Scientific Notation:1.23e4")
 
-option = 0
-try:
-    option = int(input("1: Coulomb's Law\n2: Gauss's Law\n0: Exit\n"))
-except ValueError:
-    print("Input a number! Rerun this program.")
+# ---------- Coulomb's Law ----------
+def coulomb_force(qA, qB, r):
+    return (k * abs(qA) * abs(qB)) / (r * r)
 
-if option == 0:
-    sys.exit(0)
-elif option == 1:
+def coulomb_charge(F, qB, r):
+    return (abs(F) * r * r) / (abs(qB) * k)
+
+def coulomb_distance(F, qA, qB):
+    # F = kqq/rr
+    return math.sqrt((k * abs(qA) * qB) / abs(F))
+
+def coulomb_constant(F, qA, qB, r):
+    # k = Frr/qq
+    return (abs(F) * r * r) / (abs(qA) * qB)
+
+def coulomb_net_force(tc, tcx, tcy, charges):
+    """
+    Net force on test charge tc at (tcx, tcy).
+    charges: a ChargeSet or a list of (q, qx, qy)
+    returns (Fx, Fy, Fmag)
+    """
+    if not isinstance(charges, ChargeSet):
+        charges = ChargeSet(charges)
+    Fx, Fy, same = charges.net_force(tc, tcx, tcy)
+    if same:
+        raise ValueError("test charge and Q at same point!")
+    return Fx, Fy, math.sqrt(Fx*Fx+Fy*Fy)
+
+# ---------- Gauss's Law: sphere ----------
+# r is the Gaussian surface radius, R the charged surface radius
+def sphere_outside_q(q, r):
+    return k*q/(r*r)
+
+def sphere_outside_p0(p, R, r):
+    return p*R*R*R/(3*vps*r*r)
+
+def sphere_inside_p0(p, r):
+    return r*p/(3*vps)
+
+def sphere_inside_q(q, R, r):
+    v=4/3*pi*R*R*R
+    return r*(q/v)/(3*vps)
+
+def sphere_outside_power(a, n, R, r):
+    # p(r)=ar^n
+    return (a*R**(n+3))/(vps*r*r*(n+3))
+
+def sphere_inside_power(a, n, r):
+    # p(r)=ar^n
+    return (a*r**(n+1))/(vps*(n+3))
+
+# ---------- Gauss's Law: cylinder and plane ----------
+# cylinder: r is the Gaussian cylinder radius, R the charged cylinder radius
+def cylinder_outside_lambda(l, r):
+    # l is the charge per unit length
+    return l/(2*pi*vps*r)
+
+def cylinder_outside_p0(p, R, r):
+    return p*R*R/(2*vps*r)
+
+def cylinder_inside_p0(p, r):
+    return p*r/(2*vps)
+
+# plane: s is the surface charge density; a slab of thickness d has its
+# middle at z = 0
+def plane_sigma(s):
+    return s/(2*vps)
+
+def slab_outside_p0(p, d):
+    return p*d/(2*vps)
+
+def slab_inside_p0(p, z):
+    return p*z/vps
+
+# problem name -> (solver, argument names), shared by the batch mode
+PROBLEMS = {
+    "coulomb.force": (coulomb_force, ("qA", "qB", "r")),
+    "coulomb.charge": (coulomb_charge, ("F", "qB", "r")),
+    "coulomb.distance": (coulomb_distance, ("F", "qA", "qB")),
+    "coulomb.constant": (coulomb_constant, ("F", "qA", "qB", "r")),
+    "coulomb.net_force": (coulomb_net_force, ("tc", "tcx", "tcy", "charges")),
+    "gauss.sphere.outside_q": (sphere_outside_q, ("q", "r")),
+    "gauss.sphere.outside_p0": (sphere_outside_p0, ("p", "R", "r")),
+    "gauss.sphere.inside_p0": (sphere_inside_p0, ("p", "r")),
+    "gauss.sphere.inside_q": (sphere_inside_q, ("q", "R", "r")),
+    "gauss.sphere.outside_power": (sphere_outside_power, ("a", "n", "R", "r")),
+    "gauss.sphere.inside_power": (sphere_inside_power, ("a", "n", "r")),
+    "gauss.cylinder.outside_lambda": (cylinder_outside_lambda, ("l", "r")),
+    "gauss.cylinder.outside_p0": (cylinder_outside_p0, ("p", "R", "r")),
+    "gauss.cylinder.inside_p0": (cylinder_inside_p0, ("p", "r")),
+    "gauss.plane.sigma": (plane_sigma, ("s",)),
+    "gauss.plane.slab_outside_p0": (slab_outside_p0, ("p", "d")),
+    "gauss.plane.slab_inside_p0": (slab_inside_p0, ("p", "z")),
+}
+
+def solve(problem, params):
+    """Solve one named problem; params maps argument names to values."""
+    if problem not in PROBLEMS:
+        raise ValueError("unknown problem {p!r}".format(p=problem))
+    fn, names = PROBLEMS[problem]
+    missing = [n for n in names if n not in params]
+    if missing:
+        raise ValueError("missing {m}".format(m=", ".join(missing)))
+    args = []
+    for n in names:
+        if n == "charges":
+            args.append([[float(v) for v in c] for c in params[n]])
+        else:
+            args.append(float(params[n]))
+    res = fn(*args)
+    if problem == "coulomb.net_force":
+        return {"Fx": res[0], "Fy": res[1], "Fmag": res[2]}
+    if isinstance(res, complex):
+        # e.g. a fractional power of a negative r
+        raise ValueError("no real result ({r})".format(r=res))
+    return res
+
+# ---------- Batch mode ----------
+def _read_records(f, fmt):
+    # yields one dict per record, or the parse error in its place so that
+    # solve_stream can report it and carry on
+    import json
+    if fmt == "csv":
+        import csv
+        for row in csv.DictReader(f):
+            rec = {}
+            try:
+                for key, val in row.items():
+                    if key is None or val is None or val == "":
+                        continue
+                    # net force charges come as a JSON list in one cell
+                    rec[key] = json.loads(val) if key == "charges" else val
+            except ValueError as e:
+                rec = e
+            yield rec
+    else:
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield e
+
+def solve_stream(records):
+    """
+    Solve records one at a time. Each record is a dict with a "problem"
+    name and its arguments; yields one output record per input with either
+    a "result" or an "error", so a bad problem never stops the batch.
+    A record that is an exception (a line that failed to parse) is
+    reported as that error.
+    """
+    import json
+    for i, rec in enumerate(records, 1):
+        out = {"record": i}
+        if isinstance(rec, dict) and "id" in rec:
+            out["id"] = rec["id"]
+        try:
+            if isinstance(rec, Exception):
+                raise rec
+            if not isinstance(rec, dict):
+                raise TypeError("record must be an object, not {t}".format(t=type(rec).__name__))
+            out["problem"] = rec.get("problem")
+            res = solve(rec.get("problem"), rec)
+            # anything that can't be written out is this record's error
+            json.dumps(res)
+            out["result"] = res
+        except Exception as e:
+            out["error"] = "{t}: {m}".format(t=type(e).__name__, m=e)
+        yield out
+
+def batch(src, dst, fmt=None):
+    """
+    Stream problems from src to dst as JSONL, one line per problem.
+    src / dst: file paths, or "-" for stdin / stdout
+    fmt: "jsonl" or "csv"; guessed from the file name when None
+    returns (solved, failed) counts
+    """
+    import json
+    if fmt is None:
+        fmt = "csv" if src.lower().endswith(".csv") else "jsonl"
+    fin = sys.stdin if src == "-" else open(src, newline="")
+    fout = sys.stdout if dst == "-" else open(dst, "w")
+    solved = failed = 0
+    try:
+        for out in solve_stream(_read_records(fin, fmt)):
+            if "error" in out:
+                failed += 1
+            else:
+                solved += 1
+            fout.write(json.dumps(out) + "\n")
+            fout.flush()
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    return solved, failed
+
+def batch_main(argv):
+    import argparse
+    ap = argparse.ArgumentParser(prog="enmpy.py --batch",
+                                 description="Solve enmpy problems from a JSONL/CSV file or stdin.")
+    ap.add_argument("input", nargs="?", default="-", help="problem file, - for stdin")
+    ap.add_argument("-o", "--output", default="-", help="result file, - for stdout")
+    ap.add_argument("--format", choices=("jsonl", "csv"), help="input format")
+    ap.add_argument("--list", action="store_true", help="list problem names and arguments")
+    args = ap.parse_args(argv)
+    if args.list:
+        for name in PROBLEMS:
+            print(name, " ".join(PROBLEMS[name][1]))
+        return 0
+    solved, failed = batch(args.input, args.output, args.format)
+    sys.stderr.write("{s} solved, {f} failed\n".format(s=solved, f=failed))
+    return 1 if failed else 0
+
+# ---------- Interactive menu ----------
+def coulomb_menu():
     solve = 0
     try:
         solve = int(input("1: Force\n2: Charge\n3: Distance\n4: Constant\n5: Net force\n"))
@@ -62,81 +270,89 @@ elif option == 1:
         print("Input a number! Rerun this program.")
     if solve == 1:
         try:
-            qA = abs(float(input("qA=")))
-            qB = abs(float(input("qB=")))
+            qA = float(input("qA="))
+            qB = float(input("qB="))
             r = float(input("r="))
-            print((k * qA * qB) / (r * r))
+            print(coulomb_force(qA, qB, r))
         except ValueError:
             print("Input numbers!")
     if solve == 2:
         try:
-            F = abs(float(input("F=")))
-            qB = abs(float(input("qB=")))
+            F = float(input("F="))
+            qB = float(input("qB="))
             r = float(input("r="))
-            print((F * r * r) / (qB * k))
+            print(coulomb_charge(F, qB, r))
         except ValueError:
             print("Input numbers!")
     if solve == 3:
         try:
-            F = abs(float(input("F=")))
-            qA = abs(float(input("qA=")))
+            F = float(input("F="))
+            qA = float(input("qA="))
             qB = float(input("qB="))
-            # F = kqq/rr
-            print(math.sqrt((k * qA * qB) / F))
+            print(coulomb_distance(F, qA, qB))
         except ValueError:
             print("Input numbers!")
     if solve == 4:
         try:
-            F = abs(float(input("F=")))
-            qA = abs(float(input("qA=")))
+            F = float(input("F="))
+            qA = float(input("qA="))
             qB = float(input("qB="))
             r = float(input("r="))
-            print(math.sqrt((F * r * r) / (qA * qB)))
+            print(coulomb_constant(F, qA, qB, r))
         except ValueError:
             print("Input numbers!")
     if solve == 5:
         try:
-            Fx = 0
-            Fy = 0
             tc = float(input("test charge="))
             tcx = float(input("test charge x="))
             tcy = float(input("test charge y="))
-            q = 1
-            while(q != 0):
-                print("enter q=0 to exit")
-                q = float(input("q="))
-                if q==0:
-                    break
-                qx = float(input("qx="))
-                qy = float(input("qy="))
-                r = math.sqrt((tcx - qx) ** 2 + (tcy - qy) ** 2)
-                try:
-                    Fmag = (k * q * tc) / (r * r)
-                except:
+            # fixing or removing one Q only updates its own contribution
+            net = NetForce(tc, tcx, tcy)
+            edit = 1
+            while edit != 0:
+                edit = int(input("1: add Q\n2: fix Q\n3: remove Q\n4: move test charge\n0: done\n"))
+                if edit == 1:
+                    q = float(input("q="))
+                    qx = float(input("qx="))
+                    qy = float(input("qy="))
+                    net.add(q, qx, qy)
+                elif edit == 2 or edit == 3:
+                    for i, (q, qx, qy) in enumerate(net.charges):
+                        print("{n}: q={q} at ({x}, {y})".format(n=i+1, q=q, x=qx, y=qy))
+                    i = int(input("Q number=")) - 1
+                    if not 0 <= i < len(net):
+                        print("no such Q!")
+                    elif edit == 2:
+                        q = float(input("q="))
+                        qx = float(input("qx="))
+                        qy = float(input("qy="))
+                        net.update(i, q, qx, qy)
+                    else:
+                        net.remove(i)
+                elif edit == 4:
+                    tcx = float(input("test charge x="))
+                    tcy = float(input("test charge y="))
+                    net.move_test(tcx, tcy)
+                Fx, Fy, same = net.net_force()
+                if same:
                     print("test charge and Q at same point!")
-                    break
-                print("Fmag={x}".format(x=Fmag))
-                try:
-                    Fx += Fmag * ((tcx-qx)/float(r))
-                except:
-                    print("no x component")
-                try:
-                    Fy += Fmag * ((tcy-qy)/float(r))
-                except:
-                    print("no y component")
-                print("Fx={x}\nFy={y}".format(x=Fx, y=Fy))
-            print("Fx={x}\nFy={y}".format(x=Fx, y=Fy))
-            print("Fmag={Fmag}".format(Fmag=math.sqrt(Fx*Fx+Fy*Fy)))
+                else:
+                    print("Fx={x}\nFy={y}".format(x=Fx, y=Fy))
+            if not same:
+                print("Fmag={Fmag}".format(Fmag=math.sqrt(Fx*Fx+Fy*Fy)))
         except ValueError:
             print("Input numbers!")
-elif option==2:
+
+def gauss_menu():
     print("Flux = q_enc / vacuum permittivity")
+    solve = 0
     try:
         solve = int(input("1: Sphere\n2: Cylinder\n3: Plane\n"))
     except ValueError:
         print("enter a number! rerun")
     if(solve == 1):
         print("Let r be Gaussian surface radius, R is charged surface radius")
+        shape = 0
         try:
             shape = int(input("1: constant r≥R\n2: constant r<R\n3: variable r≥R\n4: variable r<R\n"))
         except ValueError:
@@ -147,12 +363,12 @@ elif option==2:
                 if mode == 1:
                     q=float(input("enter enclosed charge:"))
                     r=float(input("enter Gaussian surface radius:"))
-                    print("E=k*q/(r^2)={E}".format(E=k*q/(r*r)))
+                    print("E=k*q/(r^2)={E}".format(E=sphere_outside_q(q, r)))
                 elif mode == 2:
                     p=float(input("enter charge density p0:"))
                     R=float(input("enter charged surface radius R:"))
                     r=float(input("enter Gaussian surface radius:"))
-                    print("E=(pR^3)/(3Er^2)={E}".format(E=p*R*R*R/(3*vps*r*r)))
+                    print("E=(pR^3)/(3Er^2)={E}".format(E=sphere_outside_p0(p, R, r)))
             except ValueError:
                 print("ValueError")
         elif shape == 2:
@@ -161,14 +377,12 @@ elif option==2:
                 if mode == 1:
                     r=float(input("Gaussian surface radius r:"))
                     p=float(input("charge density p0:"))
-                    print("E=rp/(3E)={E}".format(E=r*p/(3*vps)))
+                    print("E=rp/(3E)={E}".format(E=sphere_inside_p0(p, r)))
                 elif mode == 2:
                     q=float(input("enter enclosed charge q:"))
                     R=float(input("enter charged surface radius R:"))
                     r=float(input("enter Gaussian surface radius:"))
-                    v=4/3*pi*R*R*R
-                    p=q/v
-                    print("E=rp/(3E)={E}".format(E=r*p/(3*vps)))
+                    print("E=rp/(3E)={E}".format(E=sphere_inside_q(q, R, r)))
             except ValueError:
                 print("rerun")
         elif shape == 3:
@@ -178,7 +392,7 @@ elif option==2:
                 n=float(input("(ar^n)n:"))
                 R=float(input("charged surface radius R:"))
                 r=float(input("Gaussian surface radius r:"))
-                print("E=(aR^(n+3))/(Er^2*(n+3))={E}".format(E=(a*R^(n+3))/(vps*r*r*(n+3))))
+                print("E=(aR^(n+3))/(Er^2*(n+3))={E}".format(E=sphere_outside_power(a, n, R, r)))
             except ValueError:
                 print("rerun")
         elif shape == 4:
@@ -187,11 +401,61 @@ elif option==2:
                 a=float(input("(ar^n)a:"))
                 n=float(input("(ar^n)n:"))
                 r=float(input("Gaussian surface radius r:"))
-                print("E=(4aR^(n+1))/(E(n+3))={E}".format(E=(a*r^(n+1))/(vps*(n+3))))
+                print("E=(ar^(n+1))/(E(n+3))={E}".format(E=sphere_inside_power(a, n, r)))
             except ValueError:
                 print("rerun")
         print("where E is vacuum permittivity of space")
     elif(solve == 2):
-        print("coming soon!")
+        print("Let r be Gaussian cylinder radius, R is charged cylinder radius")
+        try:
+            shape=int(input("1: line charge l\n2: constant p0 r≥R\n3: constant p0 r<R\n"))
+            if shape == 1:
+                l=float(input("enter charge per length l:"))
+                r=float(input("enter Gaussian cylinder radius:"))
+                print("E=l/(2πEr)={E}".format(E=cylinder_outside_lambda(l, r)))
+            elif shape == 2:
+                p=float(input("enter charge density p0:"))
+                R=float(input("enter charged cylinder radius R:"))
+                r=float(input("enter Gaussian cylinder radius:"))
+                print("E=(pR^2)/(2Er)={E}".format(E=cylinder_outside_p0(p, R, r)))
+            elif shape == 3:
+                p=float(input("enter charge density p0:"))
+                r=float(input("enter Gaussian cylinder radius:"))
+                print("E=pr/(2E)={E}".format(E=cylinder_inside_p0(p, r)))
+        except ValueError:
+            print("rerun")
+        print("where E is vacuum permittivity of space")
     elif(solve == 3):
-        print("comign soon!")
\ No newline at end of file
+        try:
+            shape=int(input("1: sheet s\n2: slab outside\n3: slab inside\n"))
+            if shape == 1:
+                s=float(input("enter surface charge density s:"))
+                print("E=s/(2E)={E}".format(E=plane_sigma(s)))
+            elif shape == 2:
+                p=float(input("enter charge density p0:"))
+                d=float(input("enter slab thickness d:"))
+                print("E=pd/(2E)={E}".format(E=slab_outside_p0(p, d)))
+            elif shape == 3:
+                p=float(input("enter charge density p0:"))
+                z=float(input("enter distance z from middle:"))
+                print("E=pz/E={E}".format(E=slab_inside_p0(p, z)))
+        except ValueError:
+            print("rerun")
+        print("where E is vacuum permittivity of space")
+
+def main():
+    print("Scientific Notation:1.23e4")
+    option = 0
+    try:
+        option = int(input("1: Coulomb's Law\n2: Gauss's Law\n0: Exit\n"))
+    except ValueError:
+        print("Input a number! Rerun this program.")
+    if option == 1:
+        coulomb_menu()
+    elif option == 2:
+        gauss_menu()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    main()
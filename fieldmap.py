@@ -0,0 +1,134 @@
+# fieldmap.py
+# E-field and potential maps of a set of point charges over 2D/3D grids.
+# The grid is walked in tiles of consecutive grid points (and, for large
+# charge sets, blocks of charges) sized so the temporaries stay under a
+# memory budget. Results can go straight into memory-mapped .npy files.
+import tracemalloc
+
+import numpy as np
+
+from coulomb import k
+
+MAX_BYTES = 64 * 2 ** 20    # default working-memory budget per tile
+
+
+class MapStats:
+    """What a field_map() call did: tile layout and memory use in bytes."""
+
+    def __init__(self, points, tile_points, charge_block, tiles, budget_bytes):
+        self.points = points
+        self.tile_points = tile_points
+        self.charge_block = charge_block
+        self.tiles = tiles
+        self.budget_bytes = budget_bytes
+        self.planned_peak_bytes = 0
+        self.measured_peak_bytes = None
+
+    def __repr__(self):
+        return ("MapStats(points={0}, tile_points={1}, charge_block={2}, tiles={3}, "
+                "budget_bytes={4}, planned_peak_bytes={5}, measured_peak_bytes={6})").format(
+                    self.points, self.tile_points, self.charge_block, self.tiles,
+                    self.budget_bytes, self.planned_peak_bytes, self.measured_peak_bytes)
+
+
+def _pair_bytes(dim):
+    # per (grid point, charge) pair: d (dim floats), r2 reused in place for
+    # 1/r and q/r^3, the coincidence mask, plus headroom for the mask copy
+    return 8 * (dim + 2)
+
+
+def plan(n_points, n_charges, dim, max_bytes=MAX_BYTES):
+    """Tile size (grid points) and charge block size for a memory budget."""
+    pairs = max(1, max_bytes // _pair_bytes(dim))
+    block = max(1, min(n_charges, pairs))
+    tile = max(1, min(n_points, pairs // block))
+    return tile, block
+
+
+def output_array(path, shape, dtype):
+    """An empty array, or a memory-mapped .npy file at path if one is given."""
+    if path is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def field_map(q, pos, axes, field=True, potential=True, e_path=None, v_path=None,
+              max_bytes=MAX_BYTES, dtype=np.float64, measure=False):
+    """
+    E and V of point charges q at pos over the grid spanned by axes.
+    q: charges, shape (N,)
+    pos: charge positions, shape (N, d)
+    axes: d 1D coordinate arrays (x, y[, z]); the grid is their product
+      with 'ij' indexing, so V[i, j] is at (axes[0][i], axes[1][j]).
+    e_path / v_path: write E / V into memory-mapped .npy files there
+    max_bytes: budget for the per-tile temporaries
+    measure: also measure the real peak allocation with tracemalloc
+    returns (E, V, stats): E has shape grid + (d,), V has the grid shape
+    (None for a map that was not requested). Grid points that sit on a
+    charge get NaN.
+    """
+    axes = [np.asarray(a, dtype=float).reshape(-1) for a in axes]
+    dim = len(axes)
+    q = np.asarray(q, dtype=float).reshape(-1)
+    pos = np.asarray(pos, dtype=float).reshape(len(q), dim)
+    shape = tuple(len(a) for a in axes)
+    n_points = int(np.prod(shape))
+
+    E = output_array(e_path, shape + (dim,), dtype) if field else None
+    V = output_array(v_path, shape, dtype) if potential else None
+    Ef = E.reshape(n_points, dim) if field else None
+    Vf = V.reshape(n_points) if potential else None
+
+    tile, block = plan(n_points, max(1, len(q)), dim, max_bytes)
+    stats = MapStats(n_points, tile, block, -(-n_points // tile), max_bytes)
+    # pair temporaries plus per-point indices, coordinates and accumulators
+    stats.planned_peak_bytes = tile * block * _pair_bytes(dim) + tile * (8 * (3 * dim + 2) + 1)
+
+    if measure:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+
+    for start in range(0, n_points, tile):
+        stop = min(start + tile, n_points)
+        idx = np.unravel_index(np.arange(start, stop), shape)
+        x = np.stack([axes[i][idx[i]] for i in range(dim)], axis=1)
+        e = np.zeros((stop - start, dim)) if field else None
+        v = np.zeros(stop - start) if potential else None
+        hit = np.zeros(stop - start, dtype=bool)
+        for cs in range(0, len(q), block):
+            ce = min(cs + block, len(q))
+            d = x[:, None, :] - pos[None, cs:ce, :]
+            r2 = np.einsum("ijk,ijk->ij", d, d)
+            same = r2 == 0
+            hit |= same.any(axis=1)
+            r2[same] = np.inf
+            # work in place on r2: 1/r, then q/r^3
+            inv_r = np.sqrt(r2, out=r2)
+            np.divide(1.0, inv_r, out=inv_r)
+            if potential:
+                v += inv_r @ q[cs:ce]
+            if field:
+                np.power(inv_r, 3, out=inv_r)
+                inv_r *= q[None, cs:ce]
+                e += np.einsum("ij,ijk->ik", inv_r, d)
+            # free this block before the next one is allocated
+            del d, r2, inv_r, same
+        if field:
+            e[hit] = np.nan
+            Ef[start:stop] = k * e
+        if potential:
+            v[hit] = np.nan
+            Vf[start:stop] = k * v
+
+    if measure:
+        stats.measured_peak_bytes = tracemalloc.get_traced_memory()[1] - base
+        if started:
+            tracemalloc.stop()
+    for out in (E, V):
+        if isinstance(out, np.memmap):
+            out.flush()
+    return E, V, stats
+
@@ -1,7 +1,115 @@
 # integral_calculator_steps.py
+import itertools
+import json
+import os
 import re
-import sympy as sp
-from sympy import symbols, integrate, Function, pi, E
+import signal
+import sqlite3
+import string
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# ---------- Lazy SymPy ----------
+# SymPy (and NumPy) are only imported the first time something touches
+# `sp` (`np`), so the tokenizer and shunting_yard (and process start-up)
+# don't pay for them.
+class _LazyModule:
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        import importlib
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+sp = _LazyModule("sympy", "sp")
+np = _LazyModule("numpy", "np")
+
+def sympy_loaded():
+    return not isinstance(sp, _LazyModule)
+
+# ---------- Profiling ----------
+# Stages are only timed while a PipelineProfile is active in the current
+# thread (see profiling()); otherwise each hook costs one attribute check.
+class PipelineProfile:
+    """
+    Wall time and net memory blocks per stage of the parse -> integrate
+    pipeline: tokenize, shunting_yard, rpn_to_sympy, cache, rule:<name>
+    (inclusive of the rules it recurses into), simplify and
+    fallback:<method>. net_blocks is the change in sys.getallocatedblocks()
+    over the stage, i.e. blocks allocated minus blocks freed, not a count
+    of allocations.
+    hook: optional callable(stage, seconds, net_blocks), called after each stage
+    """
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.stages = {}
+
+    def record(self, stage, seconds, net_blocks):
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = {"calls": 0, "seconds": 0.0, "net_blocks": 0}
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["net_blocks"] += net_blocks
+        if self.hook is not None:
+            self.hook(stage, seconds, net_blocks)
+
+    def merge(self, stages):
+        for stage, entry in stages.items():
+            mine = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "net_blocks": 0})
+            for field in mine:
+                mine[field] += entry[field]
+
+    def timed(self, stage, fn, *args, **kwargs):
+        b0 = sys.getallocatedblocks()
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - t0, sys.getallocatedblocks() - b0)
+
+    def report(self):
+        """Stages as text, slowest first."""
+        lines = [f"{'stage':<28}{'calls':>8}{'seconds':>12}{'net blocks':>12}"]
+        for stage, e in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"]):
+            lines.append(f"{stage:<28}{e['calls']:>8}{e['seconds']:>12.6f}{e['net_blocks']:>12}")
+        return "\n".join(lines)
+
+    def clear(self):
+        self.stages.clear()
+
+class _Active(threading.local):
+    profile = None
+
+_active = _Active()
+
+@contextmanager
+def profiling(profile=None):
+    """
+    Record every pipeline stage run in this thread inside the block.
+    Yields the PipelineProfile (a new one unless profile is given).
+    """
+    if profile is None:
+        profile = PipelineProfile()
+    previous = _active.profile
+    _active.profile = profile
+    try:
+        yield profile
+    finally:
+        _active.profile = previous
+
+def _timed(stage, fn, *args, **kwargs):
+    prof = _active.profile
+    if prof is None:
+        return fn(*args, **kwargs)
+    return prof.timed(stage, fn, *args, **kwargs)
 
 # ---------- Tokenizer ----------
 _token_spec = [
@@ -16,7 +124,7 @@ _token_spec = [
 ]
 _token_re = re.compile("|".join("(?P<%s>%s)" % pair for pair in _token_spec))
 
-CONSTANTS = {"pi": pi, "e": E}
+CONSTANTS = {"pi": "pi", "e": "E"}  # name -> SymPy attribute
 
 def tokenize(expr):
     tokens = []
@@ -46,30 +154,24 @@ _prec = {
     '^': (4, 'R'),
 }
 
+# implicit multiplication goes between these kinds of neighbours (never
+# after a FUNC, so "sin(" stays a call)
+_IMPLICIT_LEFT = frozenset(("NUMBER", "NAME", "RPAREN"))
+_IMPLICIT_RIGHT = frozenset(("NAME", "LPAREN", "NUMBER"))
+
 def shunting_yard(tokens):
     output = []
     stack = []
     prev_token = None
+    n_tokens = len(tokens)
+    mul_prec = _prec['*'][0]
     for i, (tok_type, tok) in enumerate(tokens):
-        next_tok = tokens[i + 1] if i + 1 < len(tokens) else None
-
-        def insert_implicit_mul():
-            # don't insert implicit mul when previous token is a function name
-            if prev_token is None:
-                return False
-            pt, _ = prev_token
-            # only insert implicit multiplication if previous was NUMBER/NAME/RPAREN
-            # and current is NAME/LPAREN/NUMBER, but NOT when previous is FUNC
-            if pt in ("NUMBER", "NAME", "RPAREN") and tok_type in ("NAME", "LPAREN", "NUMBER"):
-                return True
-            return False
+        next_tok = tokens[i + 1] if i + 1 < n_tokens else None
 
-        if insert_implicit_mul():
+        if prev_token is not None and prev_token[0] in _IMPLICIT_LEFT and tok_type in _IMPLICIT_RIGHT:
             # push a multiplication operator before handling current token
-            while stack and stack[-1][0] == "OP" and (
-                (_prec[stack[-1][1]][0] > _prec['*'][0]) or
-                (_prec[stack[-1][1]][0] == _prec['*'][0] and _prec[stack[-1][1]][1] == 'L')
-            ):
+            # ('*' is left-associative, so pop everything of equal or higher precedence)
+            while stack and stack[-1][0] == "OP" and _prec[stack[-1][1]][0] >= mul_prec:
                 output.append(stack.pop())
             stack.append(("OP", "*"))
 
@@ -125,9 +227,47 @@ def shunting_yard(tokens):
     return output
 
 # ---------- RPN -> SymPy (robust, with helpful error messages) ----------
-def rpn_to_sympy(rpn, var_name='x'):
+class _Nary:
+    """Operands of a + or * chain, collected until the node is needed."""
+    __slots__ = ("op", "args")
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+
+    def build(self):
+        return sp.Add(*self.args) if self.op == '+' else sp.Mul(*self.args)
+
+def _built(a):
+    return a.build() if isinstance(a, _Nary) else a
+
+def _nary_apply(a, b, val):
+    # a - b -> a + (-b), a / b -> a * b**-1, then extend a's operand list
+    op = '+' if val in '+-' else '*'
+    if val == '-':
+        b = -_built(b)
+    elif val == '/':
+        b = sp.Pow(_built(b), -1)
+    if isinstance(a, _Nary) and a.op == op:
+        node = a
+    else:
+        node = _Nary(op, [_built(a)])
+    if isinstance(b, _Nary) and b.op == op:
+        node.args.extend(b.args)
+    else:
+        node.args.append(_built(b))
+    return node
+
+def rpn_to_sympy(rpn, var_name='x', large=False):
+    """
+    large: collect the operands of +/- and * and / chains and build each
+    Add/Mul once, instead of re-flattening at every binary step (linear
+    instead of quadratic on sums with thousands of terms). The result is
+    mathematically equal but may differ in form, e.g. 2*(x+1)*y keeps the
+    2 outside the sum.
+    """
     sym_vars = {}
-    x = symbols(var_name)
+    x = sp.symbols(var_name)
     sym_vars[var_name] = x
     stack = []
     for idx, (kind, val) in enumerate(rpn):
@@ -141,16 +281,20 @@ def rpn_to_sympy(rpn, var_name='x'):
             elif kind == "NAME":
                 lname = val.lower()
                 if lname in CONSTANTS:
-                    stack.append(CONSTANTS[lname])
+                    stack.append(getattr(sp, CONSTANTS[lname]))
                 else:
                     if val not in sym_vars:
-                        sym_vars[val] = symbols(val)
+                        sym_vars[val] = sp.symbols(val)
                     stack.append(sym_vars[val])
             elif kind == "OP":
                 if len(stack) < 2:
                     raise SyntaxError(f"Not enough operands for operator '{val}' at RPN index {idx}. RPN: {rpn}")
                 b = stack.pop()
                 a = stack.pop()
+                if large and val != '^':
+                    stack.append(_nary_apply(a, b, val))
+                    continue
+                a, b = _built(a), _built(b)
                 if val == '+': stack.append(a + b)
                 elif val == '-': stack.append(a - b)
                 elif val == '*': stack.append(a * b)
@@ -160,6 +304,10 @@ def rpn_to_sympy(rpn, var_name='x'):
                     raise SyntaxError(f"Unknown operator {val}")
             elif kind == "FUNC":
                 fname = val.lower()
+                if stack:
+                    stack[-1] = _built(stack[-1])
+                if fname == "root" and len(stack) > 1:
+                    stack[-2] = _built(stack[-2])
                 # safety check: need at least one argument for unary functions
                 if fname == "neg":
                     if not stack: raise SyntaxError("Unary minus with empty stack")
@@ -184,17 +332,250 @@ def rpn_to_sympy(rpn, var_name='x'):
                     if hasattr(sp, fname):
                         stack.append(getattr(sp, fname)(a))
                     else:
-                        F = Function(val)
+                        F = sp.Function(val)
                         stack.append(F(a))
             else:
                 raise SyntaxError(f"Unknown RPN token: {kind} {val}")
         except IndexError:
             raise SyntaxError(f"Stack underflow at RPN token {idx} ({kind}, {val}). RPN: {rpn}")
     if len(stack) != 1:
-        raise SyntaxError(f"Invalid expression: leftover stack {stack}. RPN was: {rpn}")
-    return stack[0]
+        raise SyntaxError(f"Invalid expression: leftover stack {[_built(a) for a in stack]}. RPN was: {rpn}")
+    return _built(stack[0])
+
+# ---------- Time limits ----------
+# Budgets are enforced with SIGALRM in the main thread, which interrupts
+# SymPy wherever it is. Elsewhere the whole integration runs in a forked
+# child that is killed when the budget runs out.
+MANUAL_TIME = 2.0   # seconds for the manualintegrate attempt when unbounded
+
+class IntegrationTimeout(TimeoutError):
+    """An integration ran past its time budget and was cancelled."""
+
+    def __init__(self, expr, budget, elapsed, stage="integrate_steps"):
+        super().__init__(f"integrating {expr} timed out after {elapsed:.3g}s "
+                         f"(budget {budget:.3g}s, in {stage})")
+        self.expr = expr
+        self.budget = budget
+        self.elapsed = elapsed
+        self.stage = stage
+
+    def __reduce__(self):
+        # so a timeout raised in a worker process pickles back to the parent
+        return type(self), (self.expr, self.budget, self.elapsed, self.stage)
+
+class _Expired(BaseException):
+    # BaseException so `except Exception` in SymPy or the rules can't eat it
+    def __init__(self, token):
+        super().__init__(token)
+        self.token = token
+
+_deadlines = []     # armed (deadline, token) pairs, innermost last
+
+def _on_alarm(signum, frame):
+    raise _Expired(_deadlines[-1][1])
+
+def _can_alarm():
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+@contextmanager
+def _time_limit(seconds):
+    """
+    Yields a token; _Expired(token) is raised in the block once `seconds`
+    have passed. An enclosing tighter limit stays in charge (its own token
+    is raised instead).
+    """
+    token = object()
+    deadline = time.monotonic() + seconds
+    if _deadlines and _deadlines[-1][0] <= deadline:
+        yield token
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    _deadlines.append((deadline, token))
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 1e-6))
+    try:
+        yield token
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _deadlines.pop()
+        signal.signal(signal.SIGALRM, previous)
+        if _deadlines:
+            signal.setitimer(signal.ITIMER_REAL, max(_deadlines[-1][0] - time.monotonic(), 1e-6))
+
+def _remaining():
+    return _deadlines[-1][0] - time.monotonic() if _deadlines else None
+
+def _attempt(fn, seconds):
+    """fn() under its own budget; None if that budget ran out."""
+    if seconds is None or not _can_alarm():
+        return fn()
+    with _time_limit(seconds) as token:
+        try:
+            return fn()
+        except _Expired as e:
+            if e.token is not token:
+                raise
+    return None
+
+def _fallback_integrate(expr, var):
+    """
+    Cheap rule-based manualintegrate first, then the full SymPy integrator
+    with whatever budget is left. Returns (antiderivative, method).
+    """
+    from sympy.integrals.manualintegrate import manualintegrate
+    left = _remaining()
+    share = MANUAL_TIME if left is None else min(MANUAL_TIME, left / 2)
+    try:
+        res = _timed("fallback:manualintegrate", _attempt, lambda: manualintegrate(expr, var), share)
+    except Exception:
+        res = None
+    if res is not None and not res.has(sp.Integral):
+        return res, "manualintegrate"
+    return _timed("fallback:integrate", sp.integrate, expr, var), "integrate"
+
+def _integrate_in_child(conn, expr, var, simplify, record):
+    prof = _active.profile
+    if prof is not None:
+        prof.clear()
+    try:
+        conn.send(("ok", integrate_steps(expr, var, simplify, record),
+                   prof.stages if prof is not None else None))
+    except Exception as e:
+        conn.send(("error", e, None))
+    finally:
+        conn.close()
+
+def integrate_with_timeout(expr, var, timeout=None, simplify="final", record=True):
+    """
+    integrate_steps(expr, var, simplify, record) with a time budget in
+    seconds (None for no limit). Raises IntegrationTimeout when the budget
+    runs out.
+    """
+    if timeout is None:
+        return integrate_steps(expr, var, simplify, record)
+    start = time.monotonic()
+    if _can_alarm():
+        with _time_limit(timeout) as token:
+            try:
+                return integrate_steps(expr, var, simplify, record)
+            except _Expired as e:
+                if e.token is not token:
+                    raise
+        raise IntegrationTimeout(expr, timeout, time.monotonic() - start)
+    import multiprocessing
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return integrate_steps(expr, var, simplify, record)
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_integrate_in_child, args=(child, expr, var, simplify, record), daemon=True)
+    proc.start()
+    child.close()
+    try:
+        if not parent.poll(timeout):
+            proc.terminate()
+            raise IntegrationTimeout(expr, timeout, time.monotonic() - start)
+        status, value, stages = parent.recv()
+    finally:
+        parent.close()
+        proc.join()
+    if stages is not None:
+        _active.profile.merge(stages)
+    if status == "error":
+        raise value
+    return value
+
+# ---------- Steps ----------
+class _StepFormatter(string.Formatter):
+    # "{u:p}" renders an operand with sp.pretty, anything else with str
+    def format_field(self, value, spec):
+        if spec == "p":
+            return sp.pretty(value)
+        return super().format_field(value, spec)
+
+_step_formatter = _StepFormatter()
+
+class Step:
+    """
+    One recorded rule application: the rule name, a message template and
+    the SymPy operands it refers to. Text is only built by render()/str().
+    """
+    __slots__ = ("rule", "template", "operands")
+
+    def __init__(self, rule, template, operands):
+        self.rule = rule
+        self.template = template
+        self.operands = operands
+
+    def render(self):
+        return _step_formatter.format(self.template, **self.operands)
+
+    __str__ = render
+
+    def __repr__(self):
+        return f"Step({self.rule!r}, {self.operands!r})"
+
+    def to_json(self):
+        ops = {}
+        for name, v in self.operands.items():
+            ops[name] = ["sympy", sp.srepr(v)] if isinstance(v, sp.Basic) else ["str", str(v)]
+        return {"rule": self.rule, "template": self.template, "operands": ops}
+
+    @classmethod
+    def from_json(cls, d):
+        ops = {name: sp.sympify(v) if kind == "sympy" else v
+               for name, (kind, v) in d["operands"].items()}
+        return cls(d["rule"], d["template"], ops)
+
+class StepList(list):
+    """List of Step objects with a shorthand for recording one."""
+
+    def add(self, rule, template, **operands):
+        self.append(Step(rule, template, operands))
+
+class _NoSteps:
+    # stands in for StepList when steps are not wanted; records nothing
+    def add(self, rule, template, **operands):
+        pass
+
+    def append(self, step):
+        pass
+
+    def extend(self, steps):
+        pass
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+_NO_STEPS = _NoSteps()
+
+def _new_steps(record):
+    return StepList() if record else _NO_STEPS
+
+def render_steps(steps):
+    """Text of each step, in order."""
+    return [st.render() if isinstance(st, Step) else str(st) for st in steps]
 
 # ---------- Step-by-step integrator (covers common rules) ----------
+# "always": sp.simplify at every rule and recursion level (slow on big sums)
+# "final": simplify the finished antiderivative once (default), unless it
+#   has more than FINAL_SIMPLIFY_MAX_OPS operations: sp.simplify is far
+#   worse than linear there (e.g. tabular results of high degree)
+# "none": never simplify
+SIMPLIFY_POLICIES = ("none", "final", "always")
+FINAL_SIMPLIFY_MAX_OPS = 200
+
+def _check_policy(simplify):
+    if simplify not in SIMPLIFY_POLICIES:
+        raise ValueError(f"simplify must be one of {SIMPLIFY_POLICIES}, not {simplify!r}")
+
+def _keep(expr):
+    return expr
+
+def _simplify(expr):
+    return _timed("simplify", sp.simplify, expr)
+
 def is_polynomial_in_var(expr, var):
     try:
         p = sp.Poly(expr, var)
@@ -202,200 +583,1213 @@ def is_polynomial_in_var(expr, var):
     except Exception:
         return False
 
-def integrate_poly_times_exp(poly, exp_factor, var):
+def _poly_coeffs(poly, var):
+    # ascending coefficients of poly in var
+    return sp.Poly(poly, var).all_coeffs()[::-1]
+
+def _from_coeffs(coeffs, var):
+    return sp.Add(*[c * var**j for j, c in enumerate(coeffs) if c != 0])
+
+def _down(value, a):
+    # keep the coefficient recurrences flat when a is symbolic
+    return value if a.is_Number else sp.expand(value)
+
+def integrate_poly_times_exp(poly, exp_factor, var, simplify="final", record=True):
     """
-    Repeated IBP for polynomial * exp(a*x).
+    Tabular integration of polynomial * exp(a*x), computed directly from
+    the coefficients in time linear in the degree (no recursion).
     poly: sympy polynomial in var
     exp_factor: sympy expression exp(a*var)
-    returns (antiderivative, [steps...])
-    Uses recursion: I[P] = P * v - (1/a) I[P']
-    v = exp(a*x)/a
-    """
-    steps = []
-    # extract a from exp(a*x)
-    exponent = exp_factor.args[0]
-    A = sp.Wild('A')
-    m = exponent.match(A * var)
-    if m:
-        a = m[A]
-    elif exponent == var:
-        a = sp.Integer(1)
-    else:
-        # cannot extract a; fallback
-        return None, []
-    a = sp.simplify(a)
-
-    def rec(P):
-        # returns (antiderivative_expr, steps_list)
-        if P == 0:
-            return 0, []
-        if P.is_Number:
-            # ∫ c e^{ax} dx = c e^{ax} / a
-            step = f"Integrate constant * exp: ∫ {sp.pretty(P)}*exp({a}*{var}) dx = {sp.pretty(P)}*exp({a}*{var})/{a}"
-            return P * sp.exp(a * var) / a, [step]
-        # IBP: u = P, dv = exp(a x) dx -> v = exp(a x)/a
-        v = sp.exp(a * var) / a
-        u = P
-        du = sp.diff(u, var)
-        I_next, steps_next = rec(du)
-        # result = u*v - (1/a)*I_next
-        res = u * v - (1 / a) * I_next
-        step = f"IBP: u = {sp.pretty(u)}, dv = exp({a}*{var}) dx -> v = exp({a}*{var})/{a};\n" \
-               f" so ∫ u dv = u*v - (1/{a}) ∫ u' * exp({a}*{var}) dx"
-        return sp.simplify(res), [step] + steps_next
-
-    res_expr, res_steps = rec(sp.simplify(poly))
-    return sp.simplify(res_expr), res_steps
-
-def integrate_steps(expr, var):
-    steps = []
-    x = var
-
-    # Rule: sum rule
+    simplify: one of SIMPLIFY_POLICIES
+    record: build Step objects (False skips step recording)
+    returns (antiderivative, [steps...]); antiderivative is None if a
+    cannot be extracted
+    ∫ P e^{ax} dx = Q e^{ax} with Q' + a Q = P, so from the top down
+    q_j = (p_j - (j+1) q_{j+1}) / a
+    """
+    _check_policy(simplify)
+    a = _linear_coeff(exp_factor.args[0], var)
+    if a is None:
+        return None, _new_steps(record)
+    p = _poly_coeffs(poly, var)
+    q = [0] * len(p)
+    nxt = sp.Integer(0)
+    for j in range(len(p) - 1, -1, -1):
+        nxt = _down((p[j] - (j + 1) * nxt) / a, a)
+        q[j] = nxt
+    res = sp.exp(a * var) * _from_coeffs(q, var)
+    steps = _new_steps(record)
+    steps.add("tabular_exp", "Tabular integration: ∫ P*exp({a}*{var}) dx = Q*exp({a}*{var}) with "
+                             "Q' + {a}*Q = P;\n solve for the coefficients of Q from degree {n} down.",
+              a=a, var=var, n=len(p) - 1)
+    steps.add("tabular_result", "∫ ({P})*exp({a}*{var}) dx =\n{res:p}", P=poly, a=a, var=var, res=res)
+    return _simp_for(simplify)(res), steps
+
+def integrate_poly_times_trig(poly, trig_factor, var, simplify="final", record=True):
+    """
+    Tabular integration of polynomial * sin(b*x) or * cos(b*x), linear in
+    the degree like integrate_poly_times_exp. The antiderivative is
+    A sin(bx) + B cos(bx) with A' - b B = P_sin and B' + b A = P_cos.
+    returns (antiderivative, [steps...]); antiderivative is None if b
+    cannot be extracted
+    """
+    _check_policy(simplify)
+    b = _linear_coeff(trig_factor.args[0], var)
+    if b is None:
+        return None, _new_steps(record)
+    p = _poly_coeffs(poly, var)
+    is_sin = trig_factor.func == sp.sin
+    A = [0] * len(p)
+    B = [0] * len(p)
+    a1 = b1 = sp.Integer(0)
+    for j in range(len(p) - 1, -1, -1):
+        ps, pc = (p[j], 0) if is_sin else (0, p[j])
+        a1, b1 = _down((pc - (j + 1) * b1) / b, b), _down(((j + 1) * a1 - ps) / b, b)
+        A[j], B[j] = a1, b1
+    bx = b * var
+    res = _from_coeffs(A, var) * sp.sin(bx) + _from_coeffs(B, var) * sp.cos(bx)
+    steps = _new_steps(record)
+    steps.add("tabular_trig", "Tabular integration: ∫ P*{f}({bx}) dx = A*sin({bx}) + B*cos({bx}) with "
+                              "A' - {b}*B and B' + {b}*A\n equal to the sin and cos parts of P; solve "
+                              "for their coefficients from degree {n} down.", f=trig_factor.func.__name__, bx=bx, b=b, n=len(p) - 1)
+    steps.add("tabular_result", "∫ ({P})*{f}({bx}) dx =\n{res:p}", P=poly, f=trig_factor.func.__name__,
+              bx=bx, res=res)
+    return _simp_for(simplify)(res), steps
+
+# ---------- Rule registry ----------
+class Rule:
+    """
+    One integrate_steps rule. fn(expr, var, simplify, record) returns
+    (antiderivative, steps) when it applies and None otherwise.
+    heads: expression heads the rule can apply to ("*" for any)
+    calls / hits / seconds: usage counters; seconds is cumulative and
+    includes the rules it recurses into.
+    """
+    __slots__ = ("name", "heads", "priority", "fn", "calls", "hits", "seconds")
+
+    def __init__(self, name, heads, priority, fn):
+        self.name = name
+        self.heads = heads
+        self.priority = priority
+        self.fn = fn
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.calls if self.calls else 0.0
+
+    def apply(self, expr, var, simplify, record):
+        self.calls += 1
+        prof = _active.profile
+        b0 = sys.getallocatedblocks() if prof is not None else 0
+        t0 = time.perf_counter()
+        try:
+            out = self.fn(expr, var, simplify, record)
+        finally:
+            dt = time.perf_counter() - t0
+            self.seconds += dt
+            if prof is not None:
+                prof.record("rule:" + self.name, dt, sys.getallocatedblocks() - b0)
+        if out is not None:
+            self.hits += 1
+        return out
+
+RULES = []              # every registered Rule
+_rules_by_head = {}     # head -> applicable rules in priority order (built lazily)
+
+def _rule(name, *heads, priority):
+    def register(fn):
+        RULES.append(Rule(name, heads, priority, fn))
+        RULES.sort(key=lambda r: r.priority)
+        _rules_by_head.clear()
+        return fn
+    return register
+
+def expr_head(expr):
+    """Dispatch key of an expression: Add, Mul, Pow, Symbol, Number or the function name."""
     if expr.is_Add:
-        parts = list(expr.as_ordered_terms())
-        steps.append(f"Sum rule: split into {len(parts)} term(s).")
-        antiderivs = []
-        for p in parts:
-            a_p, s_p = integrate_steps(p, var)
-            antiderivs.append(a_p)
-            steps.extend(s_p)
-        return sp.simplify(sum(antiderivs)), steps
-
-    # Rule: constant multiple
+        return "Add"
+    if expr.is_Mul:
+        return "Mul"
+    if expr.is_Pow:
+        return "Pow"
+    if expr.is_Symbol:
+        return "Symbol"
+    if expr.is_Number:
+        return "Number"
+    return type(expr).__name__
+
+def rules_for(head):
+    rules = _rules_by_head.get(head)
+    if rules is None:
+        rules = [r for r in RULES if head in r.heads or "*" in r.heads]
+        _rules_by_head[head] = rules
+    return rules
+
+def rule_stats():
+    """name -> {calls, hits, hit_rate, seconds} for every rule."""
+    return {r.name: {"calls": r.calls, "hits": r.hits, "hit_rate": r.hit_rate, "seconds": r.seconds}
+            for r in RULES}
+
+def reset_rule_stats():
+    for r in RULES:
+        r.calls = r.hits = 0
+        r.seconds = 0.0
+
+def _simp_for(simplify):
+    return _simplify if simplify == "always" else _keep
+
+def _linear_coeff(arg, var):
+    # a for arg == a*var with a independent of var, else None
+    A = sp.Wild('A', exclude=[var])
+    m = arg.match(A * var)
+    return m[A] if m else None
+
+@_rule("sum", "Add", priority=10)
+def _rule_sum(expr, var, simplify, record):
+    steps = _new_steps(record)
+    parts = list(expr.as_ordered_terms())
+    steps.add("sum", "Sum rule: split into {n} term(s).", n=len(parts))
+    antiderivs = []
+    for p in parts:
+        a_p, s_p = integrate_steps(p, var, simplify, record)
+        antiderivs.append(a_p)
+        steps.extend(s_p)
+    return _simp_for(simplify)(sp.Add(*antiderivs)), steps
+
+@_rule("constant_multiple", "*", priority=20)
+def _rule_constant_multiple(expr, var, simplify, record):
+    simp = _simp_for(simplify)
     coeff, rest = expr.as_coeff_mul(var)
-    coeff = sp.simplify(coeff)
-    if coeff != 1:
-        rest_expr = sp.Mul(*rest) if rest else sp.Integer(1)
-        steps.append(f"Constant multiple: factor out {sp.pretty(coeff)}.")
-        a_rest, s_rest = integrate_steps(rest_expr, var)
-        steps.extend(s_rest)
-        return sp.simplify(coeff * a_rest), steps
+    coeff = simp(coeff)
+    if coeff == 1:
+        return None
+    steps = _new_steps(record)
+    rest_expr = sp.Mul(*rest) if rest else sp.Integer(1)
+    steps.add("constant_multiple", "Constant multiple: factor out {coeff:p}.", coeff=coeff)
+    a_rest, s_rest = integrate_steps(rest_expr, var, simplify, record)
+    steps.extend(s_rest)
+    return simp(coeff * a_rest), steps
 
+@_rule("power", "Pow", priority=30)
+def _rule_power(expr, var, simplify, record):
     # Power rule: x**n
-    if expr.is_Pow:
-        base, exponent = expr.as_base_exp()
-        if base == var and exponent.is_Number:
-            if exponent == -1:
-                steps.append("Power rule exception: exponent = -1 -> ∫ 1/x dx = log(x).")
-                return sp.log(var), steps
-            else:
-                n = sp.simplify(exponent)
-                steps.append(f"Power rule: ∫ {var}**{n} dx = {var}**({n + 1})/({n + 1}).")
-                return sp.simplify(var ** (n + 1) / (n + 1)), steps
+    base, exponent = expr.as_base_exp()
+    if base != var or not exponent.is_Number:
+        return None
+    steps = _new_steps(record)
+    if exponent == -1:
+        steps.add("power_minus_one", "Power rule exception: exponent = -1 -> ∫ 1/x dx = log(x).")
+        return sp.log(var), steps
+    simp = _simp_for(simplify)
+    n = simp(exponent)
+    n1 = n + 1
+    steps.add("power", "Power rule: ∫ {var}**{n} dx = {var}**({n1})/({n1}).", var=var, n=n, n1=n1)
+    return simp(var ** n1 / n1), steps
 
+@_rule("identity", "Symbol", priority=40)
+def _rule_identity(expr, var, simplify, record):
     # Symbol: ∫ x dx = x^2/2
-    if expr == var:
-        steps.append(f"Basic power: ∫ {var} dx = {var}**2/2.")
-        return var**2 / 2, steps
+    if expr != var:
+        return None
+    steps = _new_steps(record)
+    steps.add("identity", "Basic power: ∫ {var} dx = {var}**2/2.", var=var)
+    return var**2 / 2, steps
 
+@_rule("reciprocal", "Pow", priority=50)
+def _rule_reciprocal(expr, var, simplify, record):
     # 1/x case
-    if expr == 1 / var:
-        steps.append("∫ 1/x dx = log(x).")
-        return sp.log(var), steps
+    if expr != 1 / var:
+        return None
+    steps = _new_steps(record)
+    steps.add("reciprocal", "∫ 1/x dx = log(x).")
+    return sp.log(var), steps
 
-    # ln(x)/x -> u-sub u = ln x
-    if expr.has(sp.log(var)) and sp.simplify(expr - sp.log(var)/var) == 0:
-        steps.append("Substitution u = log(x), du = dx/x -> ∫ u du = u^2/2.")
-        return sp.simplify(sp.log(var)**2 / 2), steps
+@_rule("log_over_x", "Mul", priority=60)
+def _rule_log_over_x(expr, var, simplify, record):
+    # ln(x)/x -> u-sub u = ln x (constant factors were already split off,
+    # so a structural comparison is enough)
+    if expr != sp.log(var) / var:
+        return None
+    steps = _new_steps(record)
+    steps.add("log_over_x", "Substitution u = log(x), du = dx/x -> ∫ u du = u^2/2.")
+    return _simp_for(simplify)(sp.log(var)**2 / 2), steps
 
+@_rule("sqrt", "Pow", priority=70)
+def _rule_sqrt(expr, var, simplify, record):
     # sqrt(x) as power
-    if expr.is_Pow and expr.base == var and expr.exp == sp.Rational(1, 2):
-        steps.append("sqrt(x) = x^(1/2); apply power rule.")
-        return sp.simplify(var ** (sp.Rational(3, 2)) * sp.Rational(2, 3)), steps
-
-    # exp-sin or exp-cos special double-IBP
-    # detect exp(a*x)*(sin(b*x) or cos(b*x)) where a and b are 1 (common case)
-    if expr.is_Mul or expr.func == sp.exp or expr.func == sp.sin or expr.func == sp.cos:
-        # attempt to detect e^{a x} * sin(b x) or * cos(b x)
-        # extract a and b if possible
-        # get factors
-        factors = expr.as_ordered_factors() if expr.is_Mul else (expr,)
-        exp_factor = None
-        trig_factor = None
-        for f in factors:
-            if f.func == sp.exp:
-                exp_factor = f
-            if f.func in (sp.sin, sp.cos):
-                trig_factor = f
-        if exp_factor is not None and trig_factor is not None:
-            a_expr = exp_factor.args[0]
-            trig_arg = trig_factor.args[0]
-            # attempt to match a*x and b*x
-            A = sp.Wild('A'); B = sp.Wild('B')
-            m1 = a_expr.match(A * var)
-            m2 = trig_arg.match(B * var)
-            if m1 and m2:
-                a = m1[A]; b = m2[B]
-                fname = trig_factor.func
-                # only implement when a and b are numbers (or 1)
-                try:
-                    a = sp.simplify(a); b = sp.simplify(b)
-                    steps.append(f"Use repeated integration by parts for exp({a}*x)*{fname.__name__}({b}*x).")
-                    # Show manual derivation for a=b=1 most common (but we can symbolically do it)
-                    # Let I = ∫ e^{a x} sin(b x) dx -> apply IBP twice and solve for I
-                    I = integrate(expr, var)  # fallback to sympy result for correctness
-                    steps.append("Applied IBP twice and solved for I algebraically (standard trick).")
-                    return sp.simplify(I), steps
-                except Exception:
-                    pass
+    if not (expr.base == var and expr.exp == sp.Rational(1, 2)):
+        return None
+    steps = _new_steps(record)
+    steps.add("sqrt", "sqrt(x) = x^(1/2); apply power rule.")
+    return _simp_for(simplify)(var ** (sp.Rational(3, 2)) * sp.Rational(2, 3)), steps
+
+@_rule("exp_trig", "Mul", priority=80)
+def _rule_exp_trig(expr, var, simplify, record):
+    # e^{a x} * sin(b x) or * cos(b x): IBP twice and solve for I
+    if len(expr.args) != 2:
+        return None
+    exp_factor = next((f for f in expr.args if f.func == sp.exp), None)
+    trig_factor = next((f for f in expr.args if f.func in (sp.sin, sp.cos)), None)
+    if exp_factor is None or trig_factor is None:
+        return None
+    a = _linear_coeff(exp_factor.args[0], var)
+    b = _linear_coeff(trig_factor.args[0], var)
+    if a is None or b is None:
+        return None
+    simp = _simp_for(simplify)
+    a = simp(a); b = simp(b)
+    fname = trig_factor.func
+    steps = _new_steps(record)
+    steps.add("exp_trig", "Use repeated integration by parts for exp({a}*x)*{fname}({b}*x).",
+              a=a, fname=fname.__name__, b=b)
+    ax, bx = a * var, b * var
+    if fname == sp.sin:
+        res = sp.exp(ax) * (a * sp.sin(bx) - b * sp.cos(bx)) / (a**2 + b**2)
+    else:
+        res = sp.exp(ax) * (a * sp.cos(bx) + b * sp.sin(bx)) / (a**2 + b**2)
+    steps.add("exp_trig_solve", "Applied IBP twice and solved I = ∫ exp({a}*x)*{fname}({b}*x) dx "
+                                "algebraically:\n{res:p}", a=a, fname=fname.__name__, b=b, res=res)
+    return simp(res), steps
+
+@_rule("poly_trig", "Mul", priority=85)
+def _rule_poly_trig(expr, var, simplify, record):
+    # polynomial * sin(b*x) or * cos(b*x)
+    trig_factor = next((f for f in expr.args if f.func in (sp.sin, sp.cos)), None)
+    if trig_factor is None:
+        return None
+    rest = sp.Mul(*[f for f in expr.args if f is not trig_factor])
+    if not is_polynomial_in_var(rest, var):
+        return None
+    res, steps_tab = integrate_poly_times_trig(rest, trig_factor, var, simplify, record)
+    if res is None:
+        return None
+    steps = _new_steps(record)
+    steps.add("poly_trig", "Detected polynomial * trig; use tabular integration by parts.")
+    steps.extend(steps_tab)
+    return res, steps
 
+@_rule("poly_exp", "Mul", priority=90)
+def _rule_poly_exp(expr, var, simplify, record):
     # polynomial * exp(a*x)
-    if expr.is_Mul:
-        factors = expr.args
-        exp_factor = next((f for f in factors if f.func == sp.exp), None)
-        if exp_factor is not None:
-            other_factors = [f for f in factors if f is not exp_factor]
-            poly_candidate = sp.Mul(*other_factors) if other_factors else sp.Integer(1)
-            if is_polynomial_in_var(poly_candidate, var):
-                steps.append("Detected polynomial * exponential; use repeated integration by parts.")
-                res, steps_ibp = integrate_poly_times_exp(poly_candidate, exp_factor, var)
-                if steps_ibp:
-                    steps.extend(steps_ibp)
-                    return sp.simplify(res), steps
-
-    # basic functions: sin, cos, exp
-    if expr.func == sp.sin:
-        steps.append("Basic trig: ∫ sin(x) dx = -cos(x).")
-        return -sp.cos(var), steps
-    if expr.func == sp.cos:
-        steps.append("Basic trig: ∫ cos(x) dx = sin(x).")
-        return sp.sin(var), steps
-    if expr.func == sp.exp:
-        # exp(a*x)
-        exponent = expr.args[0]
-        A = sp.Wild('A')
-        m = exponent.match(A * var)
-        if m:
-            a = m[A]
-            steps.append(f"Basic exp: ∫ exp({a}*x) dx = exp({a}*x)/{a}.")
-            return sp.exp(a * var) / a, steps
-        else:
-            # exp of something else: fallback
-            pass
+    factors = expr.args
+    exp_factor = next((f for f in factors if f.func == sp.exp), None)
+    if exp_factor is None:
+        return None
+    other_factors = [f for f in factors if f is not exp_factor]
+    poly_candidate = sp.Mul(*other_factors) if other_factors else sp.Integer(1)
+    if not is_polynomial_in_var(poly_candidate, var):
+        return None
+    res, steps_tab = integrate_poly_times_exp(poly_candidate, exp_factor, var, simplify, record)
+    if res is None:
+        return None
+    steps = _new_steps(record)
+    steps.add("poly_exp", "Detected polynomial * exponential; use tabular integration by parts.")
+    steps.extend(steps_tab)
+    return res, steps
+
+@_rule("sin", "sin", priority=100)
+def _rule_sin(expr, var, simplify, record):
+    a = _linear_coeff(expr.args[0], var)
+    if a is None:
+        return None
+    steps = _new_steps(record)
+    steps.add("sin", "Basic trig: ∫ sin(x) dx = -cos(x).")
+    return -sp.cos(a * var) / a, steps
 
+@_rule("cos", "cos", priority=100)
+def _rule_cos(expr, var, simplify, record):
+    a = _linear_coeff(expr.args[0], var)
+    if a is None:
+        return None
+    steps = _new_steps(record)
+    steps.add("cos", "Basic trig: ∫ cos(x) dx = sin(x).")
+    return sp.sin(a * var) / a, steps
+
+@_rule("exp", "exp", priority=100)
+def _rule_exp(expr, var, simplify, record):
+    # exp(a*x)
+    a = _linear_coeff(expr.args[0], var)
+    if a is None:
+        return None
+    steps = _new_steps(record)
+    steps.add("exp", "Basic exp: ∫ exp({a}*x) dx = exp({a}*x)/{a}.", a=a)
+    return sp.exp(a * var) / a, steps
+
+@_rule("fallback", "*", priority=1000)
+def _rule_fallback(expr, var, simplify, record):
     # fallback: not covered by stepper -> let SymPy integrate
-    steps.append("No simple step-by-step rule matched; falling back to SymPy integrator for final result.")
+    steps = _new_steps(record)
+    steps.add("fallback", "No simple step-by-step rule matched; falling back to SymPy integrator for final result.")
     try:
-        res = integrate(expr, var)
-        steps.append("Used SymPy.integrate() to compute the antiderivative.")
-        return sp.simplify(res), steps
+        res, method = _fallback_integrate(expr, var)
+        steps.add("fallback_method", "Used SymPy.{method}() to compute the antiderivative.", method=method)
+        return _simp_for(simplify)(res), steps
     except Exception as e:
         raise RuntimeError(f"SymPy failed to integrate: {e}")
 
+def integrate_steps(expr, var, simplify="final", record=True):
+    """
+    Tries the rules registered for expr's head (see expr_head/rules_for)
+    in priority order; the SymPy fallback rule always applies last.
+    simplify: one of SIMPLIFY_POLICIES; "final" runs the rules without
+    simplifying and simplifies the result once.
+    record: build Step objects; with False no steps are recorded and an
+    empty list is returned in their place.
+    """
+    _check_policy(simplify)
+    if simplify == "final":
+        res, steps = integrate_steps(expr, var, "none", record)
+        if sp.count_ops(res) > FINAL_SIMPLIFY_MAX_OPS:
+            return res, steps
+        return _simplify(res), steps
+    for rule in rules_for(expr_head(expr)):
+        out = rule.apply(expr, var, simplify, record)
+        if out is not None:
+            return out
+    raise RuntimeError(f"no rule applies to {expr}")
+
+# ---------- Integral cache ----------
+class IntegralCache:
+    """
+    Memo of (integrand, variable) -> (antiderivative, steps).
+    Keys are the srepr of the parsed SymPy expression, which is canonical
+    (SymPy sorts Add/Mul arguments), plus the variable name.
+    maxsize: entries kept in the in-memory LRU tier
+    path: optional SQLite file for a persistent tier that survives restarts;
+      memory misses are looked up there and promoted on a hit
+    """
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS integrals "
+                             "(key TEXT PRIMARY KEY, antideriv TEXT, steps TEXT)")
+            self._db.commit()
+
+    @staticmethod
+    def key(expr, var, variant=""):
+        return f"{var}|{variant}|{sp.srepr(expr)}"
+
+    def get(self, expr, var, variant=""):
+        """
+        (antiderivative, steps) or None. variant separates results of the
+        same integral computed with different options (e.g. simplify policy).
+        """
+        key = self.key(expr, var, variant)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                antideriv, steps = self._lru[key]
+                return antideriv, StepList(steps)
+            row = None
+            if self._db is not None:
+                row = self._db.execute("SELECT antideriv, steps FROM integrals WHERE key = ?",
+                                       (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        antideriv = sp.sympify(row[0])
+        steps = StepList(Step.from_json(d) for d in json.loads(row[1]))
+        self._remember(key, antideriv, steps)
+        return antideriv, StepList(steps)
+
+    def put(self, expr, var, antideriv, steps, variant=""):
+        key = self.key(expr, var, variant)
+        self._remember(key, antideriv, list(steps))
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO integrals VALUES (?, ?, ?)",
+                                 (key, sp.srepr(antideriv), json.dumps([st.to_json() for st in steps])))
+                self._db.commit()
+
+    def _remember(self, key, antideriv, steps):
+        with self._lock:
+            self._lru[key] = (antideriv, steps)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._lru)}
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+            if disk and self._db is not None:
+                self._db.execute("DELETE FROM integrals")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+# used by integrate_string_with_steps unless it is given another cache;
+# replace it (e.g. with IntegralCache(path="integrals.db")) to persist
+integral_cache = IntegralCache()
+
 # ---------- Top-level parse + integrate (with steps) ----------
-def integrate_string_with_steps(expr_str, var_name='x', show_debug=False):
-    tokens = tokenize(expr_str)
+def integrate_string_with_steps(expr_str, var_name='x', show_debug=False, cache=None, large=False,
+                                timeout=None, simplify="final", steps=True, profile=None):
+    """
+    cache: an IntegralCache, None for the module-level integral_cache,
+    or False to always integrate from scratch.
+    large: parse with rpn_to_sympy's large-expression mode.
+    timeout: time budget in seconds for the integration; past it the work
+    is cancelled and IntegrationTimeout is raised.
+    simplify: simplification policy for integrate_steps (SIMPLIFY_POLICIES).
+    steps: record Step objects; False skips step recording for throughput
+    runs and returns an empty step list.
+    profile: a PipelineProfile to record stage timings into (see profiling()).
+    Returns (integrand, antiderivative, steps); str(step) renders its text.
+    """
+    if profile is not None:
+        with profiling(profile):
+            return integrate_string_with_steps(expr_str, var_name, show_debug, cache, large,
+                                               timeout, simplify, steps)
+    tokens = _timed("tokenize", tokenize, expr_str)
     if show_debug:
         print("Tokens:", tokens)
-    rpn = shunting_yard(tokens)
+    rpn = _timed("shunting_yard", shunting_yard, tokens)
     if show_debug:
         print("RPN:", rpn)
-    symexpr = rpn_to_sympy(rpn, var_name=var_name)
-    var = symbols(var_name)
+    symexpr = _timed("rpn_to_sympy", rpn_to_sympy, rpn, var_name=var_name, large=large)
+    var = sp.symbols(var_name)
+    if cache is None:
+        cache = integral_cache
+    variant = simplify if steps else simplify + ":nosteps"
+    if cache is not False:
+        hit = _timed("cache", cache.get, symexpr, var, variant)
+        if hit is not None:
+            return symexpr, hit[0], hit[1]
     # attempt step-by-step
-    antideriv, steps = integrate_steps(symexpr, var)
-    return symexpr, antideriv, steps
+    antideriv, step_list = integrate_with_timeout(symexpr, var, timeout, simplify, record=steps)
+    if not steps:
+        step_list = []
+    if cache is not False:
+        cache.put(symexpr, var, antideriv, step_list, variant)
+    return symexpr, antideriv, step_list
+
+# ---------- NumPy compilation ----------
+# RPN function names -> NumPy expressions ({0} is the argument)
+_NUMPY_FUNCS = {
+    "neg": "(-{0})", "sqrt": "_np.sqrt({0})", "ln": "_np.log({0})", "log": "_np.log({0})",
+    "exp": "_np.exp({0})", "sin": "_np.sin({0})", "cos": "_np.cos({0})", "tan": "_np.tan({0})",
+    "sec": "(1.0/_np.cos({0}))", "csc": "(1.0/_np.sin({0}))", "cot": "(1.0/_np.tan({0}))",
+    "asin": "_np.arcsin({0})", "acos": "_np.arccos({0})", "atan": "_np.arctan({0})",
+    "sinh": "_np.sinh({0})", "cosh": "_np.cosh({0})", "tanh": "_np.tanh({0})",
+    "asinh": "_np.arcsinh({0})", "acosh": "_np.arccosh({0})", "atanh": "_np.arctanh({0})",
+    "abs": "_np.abs({0})",
+}
+_NUMPY_CONSTANTS = {"pi": "_np.pi", "e": "_np.e"}
+_NUMPY_OPS = {'+': '+', '-': '-', '*': '*', '/': '/', '^': '**'}
+
+class CompiledExpr:
+    """
+    NumPy-vectorized callable compiled from an expression.
+    Call as f(x) or f(x, a=..., b=...) for free parameters; arrays
+    broadcast. source is the generated NumPy expression (or, for
+    callables built by compile_sympy, the SymPy expression). vectorized
+    is False for the compile_sympy fallback that evaluates one element
+    at a time through mpmath.
+    """
+
+    def __init__(self, source, var_name, params, fn=None, vectorized=True):
+        self.source = source
+        self.var_name = var_name
+        self.params = params
+        self.vectorized = vectorized
+        if fn is None:
+            args = ", ".join((var_name,) + params)
+            import numpy
+            fn = eval(f"lambda {args}: {source}", {"_np": numpy})
+        self._fn = fn
+
+    def __call__(self, x, **params):
+        missing = [p for p in self.params if p not in params]
+        if missing:
+            raise TypeError(f"missing parameter(s): {', '.join(missing)}")
+        x = np.asarray(x, dtype=float)
+        out = np.asarray(self._fn(x, *[np.asarray(params[p], dtype=float) for p in self.params]))
+        shape = np.broadcast_shapes(out.shape, x.shape)
+        # constants come back as scalars; complex results stay complex
+        return np.broadcast_to(out, shape).astype(np.result_type(out, float), copy=False)
+
+    def __repr__(self):
+        return f"CompiledExpr({self.source!r})"
+
+class CompiledCache:
+    """
+    LRU of CompiledExpr objects, so an expression is only compiled once.
+    Keys are built by the compile_* functions from the RPN tokens or the
+    srepr of a SymPy expression, plus the variable name.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._lru)}
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.misses = 0
+
+# used by the compile_* functions unless they are given another cache
+compiled_cache = CompiledCache()
+
+def _cached(cache, key, build):
+    if cache is None:
+        cache = compiled_cache
+    if cache is False:
+        return build()
+    return cache.get_or_build(key, build)
+
+def compile_rpn(rpn, var_name='x', cache=None):
+    """
+    Emit NumPy code for an RPN token list (no SymPy involved). NAME tokens
+    other than var_name and the CONSTANTS become keyword parameters.
+    cache: a CompiledCache, None for compiled_cache, or False to always
+    compile.
+    """
+    return _cached(cache, ("rpn", var_name, tuple(rpn)), lambda: _emit_rpn(rpn, var_name))
+
+def _emit_rpn(rpn, var_name):
+    stack = []
+    params = []
+    for kind, val in rpn:
+        if kind == "NUMBER":
+            stack.append(repr(float(val)))
+        elif kind == "NAME":
+            lname = val.lower()
+            if val == var_name:
+                stack.append(val)
+            elif lname in _NUMPY_CONSTANTS:
+                stack.append(_NUMPY_CONSTANTS[lname])
+            else:
+                if not val.isidentifier() or val.startswith("_"):
+                    raise SyntaxError(f"Invalid parameter name {val!r}")
+                if val not in params:
+                    params.append(val)
+                stack.append(val)
+        elif kind == "OP":
+            if len(stack) < 2:
+                raise SyntaxError(f"Not enough operands for operator '{val}'. RPN: {rpn}")
+            b = stack.pop()
+            a = stack.pop()
+            stack.append(f"({a} {_NUMPY_OPS[val]} {b})")
+        elif kind == "FUNC":
+            fname = val.lower()
+            if fname == "root":
+                if len(stack) < 2:
+                    raise SyntaxError("root requires 2 arguments")
+                arg = stack.pop()
+                n = stack.pop()
+                stack.append(f"_np.power({arg}, 1.0/{n})")
+            elif fname in _NUMPY_FUNCS:
+                if not stack:
+                    raise SyntaxError(f"Function '{val}' with empty stack")
+                stack.append(_NUMPY_FUNCS[fname].format(stack.pop()))
+            else:
+                raise ValueError(f"No NumPy equivalent for function '{val}'")
+        else:
+            raise SyntaxError(f"Unknown RPN token: {kind} {val}")
+    if len(stack) != 1:
+        raise SyntaxError(f"Invalid expression: leftover stack {stack}. RPN was: {rpn}")
+    return CompiledExpr(stack[0], var_name, tuple(params))
+
+def compile_string(expr_str, var_name='x', cache=None):
+    return compile_rpn(shunting_yard(tokenize(expr_str)), var_name, cache)
+
+def compile_sympy(expr, var_name='x', cache=None):
+    """
+    CompiledExpr for a SymPy expression (e.g. an antiderivative) via
+    lambdify. Free symbols other than var_name become keyword parameters.
+    Functions NumPy has no array version of (erf, Ei, Si, uppergamma, ...
+    which lambdify maps to the scalar math module, or can't print) fall
+    back to mpmath, one element at a time (vectorized=False).
+    """
+    def build():
+        var = sp.symbols(var_name)
+        params = tuple(sorted(str(s) for s in expr.free_symbols if s != var))
+        args = [var] + [sp.Symbol(p) for p in params]
+        try:
+            fn = sp.lambdify(args, expr, "numpy")
+            with np.errstate(all="ignore"):
+                fn(*[np.full(2, 0.5)] * len(args))
+            return CompiledExpr(str(expr), var_name, params, fn)
+        except Exception:
+            pass
+        mp = sp.lambdify(args, expr, "mpmath")
+        each = np.frompyfunc(lambda *a: complex(mp(*a)), len(args), 1)
+
+        def elementwise(*a):
+            out = np.asarray(each(*a), dtype=complex)
+            return out if out.imag.any() else out.real
+        return CompiledExpr(str(expr), var_name, params, elementwise, vectorized=False)
+    return _cached(cache, ("sympy", var_name, sp.srepr(expr)), build)
+
+def compile_integral(expr_str, var_name='x', cache=None, large=False, timeout=None):
+    """
+    (integrand, antiderivative) as CompiledExpr callables. The integrand
+    is compiled from the RPN, the antiderivative comes from
+    integrate_string_with_steps (and its cache) without steps. Both are
+    cached per expression, so a repeat call does no parsing or compiling.
+    """
+    rpn = shunting_yard(tokenize(expr_str))
+
+    def build():
+        _, antideriv, _ = integrate_string_with_steps(expr_str, var_name, large=large,
+                                                      timeout=timeout, steps=False)
+        if antideriv.has(sp.Integral):
+            raise RuntimeError(f"no closed-form antiderivative for {expr_str!r}")
+        return compile_rpn(rpn, var_name, cache), compile_sympy(antideriv, var_name, cache)
+    return _cached(cache, ("integral", var_name, tuple(rpn)), build)
+
+# ---------- Definite integrals ----------
+# Gauss-Kronrod 7/15 nodes on [-1, 1] and weights (QUADPACK qk15)
+_GK_X = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+         0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+         0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+         0.207784955007898467600689403773245, 0.0)
+_GK_WK = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+          0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+          0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+          0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+_GK_WG = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+          0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+def _gk15_tables():
+    nodes = np.array(_GK_X[:7] + tuple(-x for x in _GK_X[:7]) + (0.0,))
+    wk = np.array(_GK_WK[:7] * 2 + (_GK_WK[7],))
+    wg = np.zeros(15)
+    # Gauss nodes are the odd-indexed Kronrod nodes and the center
+    for j, g in zip((1, 3, 5), _GK_WG[:3]):
+        wg[j] = wg[j + 7] = g
+    wg[14] = _GK_WG[3]
+    return nodes, wk, wg
+
+def gauss_kronrod(f, a, b, tol=1e-10, rtol=1e-10, max_depth=40):
+    """
+    Vectorized adaptive G7-K15 quadrature of f over every interval (a[i], b[i]).
+    f must accept a 2D array of points. All intervals (and their bisections)
+    are evaluated together; a piece is accepted once its |K15 - G7| error is
+    within its width's share of max(tol, rtol*|piece|), or at max_depth.
+    returns (values, error_estimates) shaped like broadcast(a, b)
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    shape = a.shape
+    a, b = a.ravel(), b.ravel()
+    n = len(a)
+    nodes, wk, wg = _gk15_tables()
+    total = np.zeros(n)
+    error = np.zeros(n)
+    full = np.abs(b - a)
+    full[full == 0] = 1.0
+    lo, hi = a, b
+    owner = np.arange(n)
+    depth = 0
+    while len(lo):
+        c = 0.5 * (lo + hi)
+        h = 0.5 * (hi - lo)
+        fx = f(c[:, None] + h[:, None] * nodes[None, :])
+        K = h * (fx @ wk)
+        err = np.abs(K - h * (fx @ wg))
+        share = np.abs(hi - lo) / full[owner]
+        done = (err <= np.maximum(tol, rtol * np.abs(K)) * share) | ~np.isfinite(err) | (depth >= max_depth)
+        total += np.bincount(owner[done], weights=K[done], minlength=n)
+        error += np.bincount(owner[done], weights=err[done], minlength=n)
+        keep = ~done
+        lo = np.concatenate([lo[keep], c[keep]])
+        hi = np.concatenate([c[keep], hi[keep]])
+        owner = np.concatenate([owner[keep], owner[keep]])
+        depth += 1
+    return total.reshape(shape), error.reshape(shape)
+
+class DefiniteIntegrals:
+    """
+    Result of integrate_definite: values and error estimates shaped like
+    the bounds, which entries came from the antiderivative (symbolic mask,
+    error 0) and the antiderivative itself when one was used.
+    """
+
+    def __init__(self, values, errors, symbolic, antideriv=None):
+        self.values = values
+        self.errors = errors
+        self.symbolic = symbolic
+        self.antideriv = antideriv
+
+    def __repr__(self):
+        return (f"DefiniteIntegrals(values={self.values!r}, errors={self.errors!r}, "
+                f"symbolic={int(np.sum(self.symbolic))}/{np.size(self.symbolic)})")
+
+def _cheap_antiderivative(rpn, var_name, budget):
+    # antiderivative from the cache or a short steps-free attempt, else None
+    try:
+        symexpr = rpn_to_sympy(rpn, var_name=var_name)
+        var = sp.symbols(var_name)
+        hit = integral_cache.get(symexpr, var, "final:nosteps") or integral_cache.get(symexpr, var, "final")
+        if hit is not None:
+            F = hit[0]
+        else:
+            F, _ = integrate_with_timeout(symexpr, var, budget, record=False)
+            integral_cache.put(symexpr, var, F, [], "final:nosteps")
+    except (IntegrationTimeout, RuntimeError, SyntaxError):
+        return None
+    if F.has(sp.Integral) or F.free_symbols - {var}:
+        return None
+    return F
+
+def _continuous_domain(F, var, lo, hi, budget):
+    # where on [lo, hi] F is real and continuous, as SymPy Intervals; None
+    # if SymPy can't tell within budget (without SIGALRM it isn't asked)
+    from sympy.calculus.util import continuous_domain
+    if budget is not None and not _can_alarm():
+        return None
+    try:
+        dom = _attempt(lambda: continuous_domain(F, var, sp.Interval(_number(lo), _number(hi))), budget)
+    except Exception:
+        return None
+    if dom is None:
+        return None
+    return [iv for iv in (dom.args if isinstance(dom, sp.Union) else (dom,)) if isinstance(iv, sp.Interval)]
+
+def _suspect_cells(Fn, f, lo, hi, n=4097):
+    # sampled check of F over [lo, hi]: a cell is suspect where F or f is
+    # not finite and real, or F changes by more than its slope f allows
+    # (a jump across a pole or branch cut). returns (grid, suspect)
+    x = np.linspace(lo, hi, n)
+    with np.errstate(all="ignore"):
+        Fx = np.asarray(Fn(x), dtype=complex) * np.ones(n)
+        fx = np.asarray(f(x), dtype=complex) * np.ones(n)
+    bad = ~(np.isfinite(Fx) & np.isfinite(fx))
+    bad |= np.abs(Fx.imag) > 1e-12 * np.maximum(1.0, np.abs(Fx.real))
+    bad = bad[:-1] | bad[1:]
+    slope = np.maximum(np.abs(fx[:-1]), np.abs(fx[1:]))
+    scale = np.abs(Fx.real[np.isfinite(Fx.real)]).max(initial=1.0)
+    with np.errstate(invalid="ignore"):
+        bad |= ~(np.abs(np.diff(Fx.real)) <= 4 * (x[1] - x[0]) * slope + 1e-12 * scale)
+    return x, bad
+
+def _valid_closed_form(F, Fn, f, var, a, b, budget):
+    # bounds whose [a, b] avoids every pole and branch cut of F, so that
+    # F(b) - F(a) is the integral
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    ok = np.zeros(a.shape, dtype=bool)
+    if not a.size:
+        return ok
+    start, end = float(lo.min()), float(hi.max())
+    if start == end:
+        return np.ones(a.shape, dtype=bool)
+    domain = _continuous_domain(F, var, start, end, budget)
+    if domain is not None:
+        for iv in domain:
+            s, e = float(iv.start), float(iv.end)
+            ok |= (((lo > s) | ((lo == s) & (not iv.left_open)))
+                   & ((hi < e) | ((hi == e) & (not iv.right_open))))
+        return ok
+    x, bad = _suspect_cells(Fn, f, start, end)
+    # bounds inside one cell still overlap it; count suspect cells in between
+    first = np.clip(np.searchsorted(x, lo, side="right") - 1, 0, len(bad) - 1)
+    last = np.clip(np.searchsorted(x, hi, side="left") - 1, 0, len(bad) - 1)
+    count = np.concatenate(([0], np.cumsum(bad)))
+    return count[last + 1] - count[first] == 0
+
+def integrate_definite(expr_str, a, b, var_name='x', method="auto", tol=1e-10, rtol=1e-10,
+                       max_depth=40, symbolic_budget=0.25):
+    """
+    Definite integrals of expr_str over many (a, b) bounds at once.
+    a, b: scalars or arrays (broadcast together)
+    method: "numeric" compiles the expression to NumPy and runs
+      gauss_kronrod (SymPy is never imported); "symbolic" evaluates
+      F(b) - F(a) from the antiderivative; "auto" uses the antiderivative
+      when it is cached or found within symbolic_budget seconds, keeping
+      F(b) - F(a) where F is real and continuous on all of [a, b] (SymPy's
+      continuous_domain, or a sampled check for poles, branch cuts and
+      jumps when SymPy can't tell in the budget), and runs the adaptive
+      quadrature everywhere else.
+    returns DefiniteIntegrals
+    """
+    if method not in ("auto", "numeric", "symbolic"):
+        raise ValueError(f"unknown method {method!r}")
+    rpn = shunting_yard(tokenize(expr_str))
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    F = None
+    if method != "numeric":
+        F = _cheap_antiderivative(rpn, var_name, None if method == "symbolic" else symbolic_budget)
+        if F is None and method == "symbolic":
+            raise RuntimeError(f"no closed-form antiderivative for {expr_str!r}")
+    if F is not None:
+        try:
+            Fn = compile_sympy(F, var_name)
+            with np.errstate(all="ignore"):
+                sym = np.broadcast_to(np.asarray(Fn(b) - Fn(a), dtype=complex), a.shape)
+        except Exception:
+            # e.g. special functions NumPy can't evaluate on arrays
+            if method == "symbolic":
+                raise
+            F = None
+    if F is not None:
+        good = np.isfinite(sym) & (np.abs(sym.imag) <= 1e-12 * np.maximum(1.0, np.abs(sym.real)))
+        sym = sym.real
+        if method == "symbolic":
+            return DefiniteIntegrals(np.where(good, sym, np.nan), np.zeros(a.shape), good, F)
+    f = compile_rpn(rpn, var_name)
+    if f.params:
+        raise ValueError(f"free parameter(s) {', '.join(f.params)} in a definite integral")
+    if F is None:
+        with np.errstate(all="ignore"):
+            values, errors = gauss_kronrod(f, a, b, tol, rtol, max_depth)
+        return DefiniteIntegrals(values, errors, np.zeros(a.shape, dtype=bool))
+    good &= _valid_closed_form(F, Fn, f, sp.symbols(var_name), a, b, symbolic_budget)
+    with np.errstate(all="ignore"):
+        values = np.where(good, sym, 0.0)
+        errors = np.zeros(a.shape)
+        if not good.all():
+            v, e = gauss_kronrod(f, a[~good], b[~good], tol, rtol, max_depth)
+            values[~good] = v
+            errors[~good] = e
+    return DefiniteIntegrals(values, errors, good, F)
+
+# ---------- Parametric templates ----------
+def _special_cases(generic, var):
+    # conditions on the parameters under which generic is undefined: a
+    # parameter-only factor of a denominator vanishes
+    dens = [sp.denom(sp.together(generic))]
+    dens += [p.base for p in generic.atoms(sp.Pow) if p.exp.is_negative]
+    found = []
+    for d in dens:
+        for f in sp.Mul.make_args(sp.factor(d)):
+            base = f.base if f.is_Pow else f
+            if not base.free_symbols or var in base.free_symbols:
+                continue
+            conds = [sp.Eq(base, 0)]
+            if len(base.free_symbols) == 1:
+                # single parameter: name its values, e.g. Eq(n, -1)
+                s, = base.free_symbols
+                conds = [sp.Eq(s, r) for r in sp.solve(base, s) if r.is_real is not False]
+            found += [c for c in conds if c not in found and c is not sp.false]
+    return found
+
+def _number(v):
+    # parameter value as an exact SymPy number (0.1 -> 1/10), which the
+    # polynomial algorithms handle better than Floats
+    return sp.Rational(repr(float(v)))
+
+class IntegralTemplate:
+    """
+    Antiderivative of an expression with free parameters (see
+    integrate_template). generic is valid except where one of the special
+    conditions holds (e.g. Eq(n, -1) or Eq(b, 0)); there the integrand is
+    re-integrated with the parameters of those conditions substituted,
+    once per distinct tuple of their values. The other parameters stay
+    symbolic, so the special antiderivatives are vectorized as well.
+    """
+
+    def __init__(self, integrand, var_name, generic, special, timeout=None, simplify="final"):
+        self.integrand = integrand
+        self.var_name = var_name
+        self.var = sp.symbols(var_name)
+        self.generic = generic
+        self.special = special
+        self.params = tuple(sorted(str(s) for s in integrand.free_symbols if s != self.var))
+        self.timeout = timeout
+        self.simplify = simplify
+        self.reintegrated = 0
+        self._instances = {}
+        self._generic = compile_sympy(generic, var_name)
+        if self._generic.vectorized:
+            cond_syms = set().union(*[c.free_symbols for c in special])
+            self._keyed = tuple(p for p in self.params if sp.Symbol(p) in cond_syms)
+        else:
+            # special functions NumPy can't evaluate: substitute every
+            # parameter per value tuple instead
+            self._keyed = self.params
+        self._is_special = None
+        if special:
+            self._is_special = sp.lambdify([sp.Symbol(p) for p in self._keyed], sp.Or(*special))
+
+    def _values(self, params):
+        missing = [p for p in self.params if p not in params]
+        if missing:
+            raise TypeError(f"missing parameter(s): {', '.join(missing)}")
+        return {p: np.asarray(params[p], dtype=float) for p in self.params}
+
+    def is_special(self, **params):
+        """Mask of the parameter values where generic is invalid (arrays broadcast)."""
+        values = self._values(params)
+        shape = np.broadcast_shapes(*[v.shape for v in values.values()])
+        if self._is_special is None:
+            return np.zeros(shape, dtype=bool)
+        mask = self._is_special(*[values[p] for p in self._keyed])
+        return np.broadcast_to(np.asarray(mask, dtype=bool), shape)
+
+    def _instance(self, key):
+        # (antiderivative, CompiledExpr) for one tuple of the keyed parameters
+        if key not in self._instances:
+            subs = {sp.Symbol(p): _number(v) for p, v in zip(self._keyed, key)}
+            if self._is_special is not None and self._is_special(*key):
+                F, _ = integrate_with_timeout(self.integrand.subs(subs), self.var, self.timeout,
+                                              self.simplify, record=False)
+                self.reintegrated += 1
+            else:
+                F = self.generic.subs(subs)
+            if F.has(sp.Integral):
+                raise RuntimeError(f"no closed-form antiderivative for {self.integrand} at {subs}")
+            self._instances[key] = F, compile_sympy(F, self.var_name)
+        return self._instances[key]
+
+    def antiderivative(self, **params):
+        """The antiderivative for one set of scalar parameter values."""
+        values = {p: float(v) for p, v in self._values(params).items()}
+        F, _ = self._instance(tuple(values[p] for p in self._keyed))
+        return F.subs({sp.Symbol(p): _number(v) for p, v in values.items()})
+
+    def __call__(self, x, /, **params):
+        """
+        F(x) for arrays of x and parameter values (broadcast together): the
+        generic antiderivative is evaluated once over all of them, then the
+        special entries are replaced.
+        """
+        values = self._values(params)
+        x = np.asarray(x, dtype=float)
+        shape = np.broadcast_shapes(x.shape, *[v.shape for v in values.values()])
+        x = np.broadcast_to(x, shape)
+        values = {p: np.broadcast_to(v, shape) for p, v in values.items()}
+        if not self._generic.vectorized:
+            mask = np.ones(shape, dtype=bool)
+            out = np.zeros(shape)
+        else:
+            mask = self.is_special(**values)
+            with np.errstate(all="ignore"):
+                out = self._generic(x, **{p: values[p] for p in self._generic.params})
+        if not mask.any():
+            return out
+        out = np.array(out)
+        rows = {p: v[mask] for p, v in values.items()}
+        xs = x[mask]
+        if self._keyed:
+            keys, inverse = np.unique(np.column_stack([rows[p] for p in self._keyed]), axis=0,
+                                      return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            keys, inverse = [()], np.zeros(len(xs), dtype=int)
+        part = np.empty(len(xs), dtype=out.dtype)
+        for i, key in enumerate(keys):
+            sel = inverse == i
+            _, Fk = self._instance(tuple(float(k) for k in key))
+            with np.errstate(all="ignore"):
+                v = Fk(xs[sel], **{p: rows[p][sel] for p in Fk.params})
+            if np.iscomplexobj(v) and not np.iscomplexobj(part):
+                part = part.astype(complex)
+                out = out.astype(complex)
+            part[sel] = v
+        out[mask] = part
+        return out
+
+    def definite(self, lower, upper, /, **params):
+        """F(upper) - F(lower) for arrays of bounds and parameter values."""
+        return self(upper, **params) - self(lower, **params)
+
+    def __repr__(self):
+        return f"IntegralTemplate({self.generic}, special={self.special})"
+
+def _is_equality(cond):
+    # Eq(...) or an And of them: a condition that only holds at isolated values
+    if isinstance(cond, sp.Eq):
+        return True
+    return isinstance(cond, sp.And) and all(isinstance(c, sp.Eq) for c in cond.args)
+
+def _split_piecewise(F, var):
+    """
+    (generic, special) from a Piecewise over parameter-only conditions.
+    Equality branches (e.g. (0, Eq(a, 0))) are special cases; the first
+    other branch is generic, and if its own condition can fail it must
+    do so only at equalities (Ne(n, -1), (n < -1) | (n > -1)). Otherwise
+    F is kept whole, with no split.
+    """
+    if not isinstance(F, sp.Piecewise) or any(var in c.free_symbols for _, c in F.args):
+        return F, []
+    special = []
+    for expr, cond in F.args:
+        cond = cond.simplify()
+        if _is_equality(cond):
+            special.append(cond)
+            continue
+        fails = sp.Not(cond).simplify()
+        if fails is sp.false:
+            return expr, special
+        if _is_equality(fails):
+            return expr, special + [fails]
+        break
+    return F, []
+
+def integrate_template(expr_str, var_name='x', timeout=None, simplify="final", cache=None,
+                       large=False):
+    """
+    Integrate expr_str once with its free NAME tokens as symbolic
+    parameters and return an IntegralTemplate. A Piecewise result from
+    the SymPy fallback is split with _split_piecewise; denominators that
+    can vanish for some parameter values add the other special cases.
+    """
+    integrand, F, _ = integrate_string_with_steps(expr_str, var_name, cache=cache, large=large,
+                                                  timeout=timeout, simplify=simplify, steps=False)
+    if F.has(sp.Integral):
+        raise RuntimeError(f"no closed-form antiderivative for {expr_str!r}")
+    var = sp.symbols(var_name)
+    F, special = _split_piecewise(sp.piecewise_fold(F), var)
+    special += [c for c in _special_cases(F, var) if c not in special]
+    return IntegralTemplate(integrand, var_name, F, special, timeout, simplify)
+
+# ---------- Parallel batch integration ----------
+class IntegrationResult:
+    """
+    Outcome of one integrate_many item.
+    status is "ok", "timeout" or "error"; on failure integrand/antideriv
+    may be None and error holds the message.
+    """
+    __slots__ = ("index", "expr_str", "integrand", "antideriv", "steps", "status", "error")
+
+    def __init__(self, index, expr_str, integrand=None, antideriv=None, steps=None,
+                 status="ok", error=None):
+        self.index = index
+        self.expr_str = expr_str
+        self.integrand = integrand
+        self.antideriv = antideriv
+        self.steps = steps if steps is not None else []
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    def __repr__(self):
+        return (f"IntegrationResult({self.index}, {self.expr_str!r}, status={self.status!r}, "
+                f"antideriv={self.antideriv})")
+
+def _integrate_one(index, expr_str, var_name, timeout, large, simplify):
+    try:
+        s, r, steps = integrate_string_with_steps(expr_str, var_name=var_name, large=large,
+                                                  timeout=timeout, simplify=simplify)
+        return IntegrationResult(index, expr_str, s, r, steps)
+    except IntegrationTimeout as e:
+        return IntegrationResult(index, expr_str, status="timeout", error=str(e))
+    except Exception as e:
+        return IntegrationResult(index, expr_str, status="error", error=f"{type(e).__name__}: {e}")
+
+def _integrate_chunk(chunk, var_name, timeout, large, simplify):
+    return [_integrate_one(i, ex, var_name, timeout, large, simplify) for i, ex in chunk]
+
+def integrate_many(exprs, var_name='x', workers=None, chunksize=8, ordered=True,
+                   timeout=None, large=False, simplify="final"):
+    """
+    Integrate many expression strings across a process pool.
+    exprs: any iterable of strings; it is consumed lazily, with at most
+      2 * workers chunks of chunksize items in flight
+    workers: pool size (default: CPU count); 1 runs everything in-process
+    ordered: yield results in input order, otherwise as chunks finish
+    timeout, large, simplify: as for integrate_string_with_steps
+    Yields one IntegrationResult per input; failures and timeouts are
+    reported on the result and never abort the batch. If a worker process
+    dies, the items it and the other workers had in progress are errors
+    and the rest run in a new pool.
+    """
+    items = enumerate(exprs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for i, ex in items:
+            yield _integrate_one(i, ex, var_name, timeout, large, simplify)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    stranded = []       # chunks a broken pool never accepted
+    done_chunks = {}    # first index -> results, for ordered output
+    next_index = 0
+    broken = True
+    while broken:
+        # a worker that dies (killed, out of memory) breaks the whole pool:
+        # the chunks it had fail, the rest of exprs goes to a new pool
+        broken = False
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}    # future -> chunk
+
+            def submit():
+                nonlocal broken
+                chunk = stranded.pop() if stranded else next(chunks, None)
+                if chunk is None or broken:
+                    if chunk is not None:
+                        stranded.append(chunk)
+                    return False
+                try:
+                    pending[pool.submit(_integrate_chunk, chunk, var_name, timeout, large, simplify)] = chunk
+                except BrokenProcessPool:
+                    stranded.append(chunk)
+                    broken = True
+                    return False
+                return True
+
+            while len(pending) < 2 * workers and submit():
+                pass
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    chunk = pending.pop(fut)
+                    try:
+                        results = fut.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        results = [IntegrationResult(i, ex, status="error", error=f"{type(e).__name__}: {e}")
+                                   for i, ex in chunk]
+                    if not ordered:
+                        yield from results
+                    else:
+                        done_chunks[results[0].index] = results
+                    submit()
+                while next_index in done_chunks:
+                    results = done_chunks.pop(next_index)
+                    next_index += len(results)
+                    yield from results
 
 # ---------- Demo ----------
 if __name__ == "__main__":
@@ -411,15 +1805,14 @@ if __name__ == "__main__":
         "x*e^x",
         "1/x"
     ]
-    for ex in examples:
-        print("===\nInput:", ex)
-        try:
-            s, r, steps = integrate_string_with_steps(ex, var_name='x', show_debug=False)
-            print("Parsed integrand (sympy):", s)
-            print("Antiderivative:", r, "+ C")
-            if steps:
+    for res in integrate_many(examples, var_name='x'):
+        print("===\nInput:", res.expr_str)
+        if res.ok:
+            print("Parsed integrand (sympy):", res.integrand)
+            print("Antiderivative:", res.antideriv, "+ C")
+            if res.steps:
                 print("Steps:")
-                for i, st in enumerate(steps, 1):
+                for i, st in enumerate(res.steps, 1):
                     print(f"  {i}. {st}")
-        except Exception as e:
-            print(f"Failed to integrate {ex!r}: {e}")
+        else:
+            print(f"Failed to integrate {res.expr_str!r}: {res.error}")
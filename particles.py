@@ -0,0 +1,107 @@
+# particles.py
+# Batched charged-particle motion in E and B fields (Boris pusher).
+# All particles are advanced together as (N, 3) arrays. Trajectories are
+# sampled every few steps and written out one buffer of frames at a time,
+# into memory-mapped .npy files when paths are given, so long runs do not
+# grow in memory. The enmpy.py notes give the checks for a uniform B:
+#   r = mv/qB, T = 2 pi m/qB
+import math
+
+import numpy as np
+
+from fieldmap import output_array
+
+CHUNK_FRAMES = 256      # trajectory frames buffered before each write
+
+
+def gyro_radius(m, v, q, B):
+    # r = mv/qB, with v the speed perpendicular to B
+    return m * v / (abs(q) * B)
+
+
+def gyro_period(m, q, B):
+    # T = 2 pi m/qB
+    return 2 * math.pi * m / (abs(q) * B)
+
+
+def _field(F, x, t):
+    # None, a constant vector (or one per particle) or a callable f(x, t)
+    if F is None:
+        return None
+    if callable(F):
+        return np.asarray(F(x, t), dtype=float)
+    return np.asarray(F, dtype=float)
+
+
+def boris_step(x, v, qm, E, B, dt):
+    """
+    One Boris step, in place: half electric kick, rotation about B, half
+    electric kick, then the drift. qm is q/m (scalar or (N, 1)).
+    The rotation keeps |v| exact in a pure magnetic field.
+    """
+    if E is not None:
+        v += 0.5 * dt * qm * E
+    if B is not None:
+        t = 0.5 * dt * qm * B
+        s = 2 * t / (1 + np.sum(t * t, axis=-1, keepdims=True))
+        vp = v + np.cross(v, t)
+        v += np.cross(vp, s)
+    if E is not None:
+        v += 0.5 * dt * qm * E
+    x += dt * v
+
+
+def push(x, v, q, m, dt, steps, E=None, B=None, every=1, x_path=None, v_path=None,
+         save_v=False, chunk_frames=CHUNK_FRAMES):
+    """
+    Advance particles through E and B with the Boris method.
+    x, v: initial positions and velocities, shape (N, 3)
+    q, m: charge and mass, scalars or one per particle
+    dt, steps: time step and number of steps
+    E, B: None, a vector (3,) or (N, 3), or a callable f(x, t) returning (N, 3)
+    every: keep one trajectory frame every this many steps (plus the start)
+    x_path / v_path: stream the frames into memory-mapped .npy files there;
+      without them the frames stay in memory, frames * N * 24 bytes each
+      for X and V, with frames = steps // every + 1
+    save_v: also keep velocity frames (always when v_path is given)
+    returns (x, v, X, V): final state, and the frames shaped
+    (frames, N, 3) (V is None unless velocities were kept)
+    """
+    x = np.array(x, dtype=float).reshape(-1, 3)
+    v = np.array(v, dtype=float).reshape(len(x), 3)
+    qm = np.asarray(q, dtype=float) / np.asarray(m, dtype=float)
+    if qm.ndim:
+        qm = qm.reshape(-1, 1)
+    frames = steps // every + 1
+    save_v = save_v or v_path is not None
+    X = output_array(x_path, (frames, len(x), 3), np.float64)
+    V = output_array(v_path, (frames, len(x), 3), np.float64) if save_v else None
+
+    bx = np.empty((min(chunk_frames, frames), len(x), 3))
+    bv = np.empty_like(bx) if save_v else None
+    filled = 0
+    written = 0
+
+    def keep():
+        nonlocal filled, written
+        bx[filled] = x
+        if save_v:
+            bv[filled] = v
+        filled += 1
+        if filled == len(bx) or written + filled == frames:
+            X[written:written + filled] = bx[:filled]
+            if save_v:
+                V[written:written + filled] = bv[:filled]
+            written += filled
+            filled = 0
+
+    keep()
+    for i in range(steps):
+        t = i * dt
+        boris_step(x, v, qm, _field(E, x, t), _field(B, x, t), dt)
+        if (i + 1) % every == 0:
+            keep()
+    for out in (X, V):
+        if isinstance(out, np.memmap):
+            out.flush()
+    return x, v, X, V
@@ -0,0 +1,281 @@
+# service.py
+# Long-lived local solve service for integralcalculator and enmpy.
+# Clients send one JSON request per line over a Unix socket (or TCP on
+# localhost) and get one JSON response per line:
+#   {"id": 1, "method": "integrate", "params": {"expr": "x*e^x"}}
+#   {"id": 1, "result": {"status": "ok", "integrand": ..., "antiderivative": ..., "steps": [...]}}
+# An integration that runs out of time or fails still gets a result, with
+# "status": "timeout" or "error" and the message in "error".
+# Integrations run in warm worker processes (SymPy already imported).
+# Identical requests that are in flight at the same time share one
+# computation, and the job queue is bounded: when it is full the service
+# stops reading from that connection until there is room again, or, with
+# max_wait set, rejects requests that have waited that long for room.
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+MAX_QUEUE = 64
+
+# methods cheap enough to answer on the event loop itself
+INLINE = ("solve", "stats", "ping")
+
+
+def _warm():
+    # worker initializer: pay the imports and first-call costs up front
+    import integralcalculator as ic
+    ic.integrate_string_with_steps("x*e^x + sin(x)", cache=False)
+
+
+def run(method, params):
+    """Compute one request; this is what the workers execute."""
+    if method == "integrate":
+        import integralcalculator as ic
+        try:
+            integrand, antideriv, steps = ic.integrate_string_with_steps(
+                params["expr"], params.get("var", "x"), timeout=params.get("timeout"),
+                simplify=params.get("simplify", "final"), steps=params.get("steps", True))
+        except ic.IntegrationTimeout as e:
+            return {"status": "timeout", "error": str(e)}
+        except Exception as e:
+            return {"status": "error", "error": "{0}: {1}".format(type(e).__name__, e)}
+        return {"status": "ok", "integrand": str(integrand), "antiderivative": str(antideriv),
+                "steps": [str(s) for s in steps]}
+    if method == "solve":
+        import enmpy
+        return enmpy.solve(params.get("problem"), params)
+    if method == "ping":
+        return "pong"
+    raise ValueError("unknown method {0!r}".format(method))
+
+
+class SolveService:
+    """
+    workers: warm worker processes (default: CPU count)
+    max_queue: jobs waiting for a worker before clients are held back
+    max_wait: seconds a request may be held back before it is rejected
+      (None: wait for room indefinitely, 0: reject at once)
+    """
+
+    def __init__(self, workers=None, max_queue=MAX_QUEUE, max_wait=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.errors = 0
+        self.restarts = 0
+        self._inflight = {}
+        self._queue = None
+        self._pool = None
+        self._server = None
+        self._tasks = []
+
+    async def start(self, path=None, host="127.0.0.1", port=None):
+        """Start the workers and listen on the Unix socket path (or host:port)."""
+        from concurrent.futures import ProcessPoolExecutor
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.max_queue)
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_warm)
+        # start every worker now rather than on the first requests
+        await asyncio.gather(*[loop.run_in_executor(self._pool, run, "ping", {})
+                               for _ in range(self.workers)])
+        self._tasks = [asyncio.ensure_future(self._dispatch()) for _ in range(self.workers)]
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, path=path)
+        else:
+            self._server = await asyncio.start_server(self._serve, host, port or 0)
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for t in self._tasks:
+            t.cancel()
+        self._pool.shutdown(cancel_futures=True)
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced,
+                "completed": self.completed, "errors": self.errors, "restarts": self.restarts,
+                "rejected": self.rejected,
+                "queued": self._queue.qsize(), "inflight": len(self._inflight),
+                "workers": self.workers, "max_queue": self.max_queue}
+
+    async def enqueue(self, method, params):
+        """
+        Future for the result of (method, params). Joins an identical
+        request that is already in flight; otherwise waits for room in the
+        queue (failing with "queue full" after max_wait seconds).
+        """
+        self.requests += 1
+        key = json.dumps([method, params], sort_keys=True)
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return fut
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        item = (method, params, fut)
+        try:
+            if self.max_wait is None or not self._queue.full():
+                await self._queue.put(item)
+            else:
+                await asyncio.wait_for(self._queue.put(item), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            fut.set_exception(RuntimeError("queue full ({0} waiting)".format(self.max_queue)))
+        except BaseException as e:
+            if not fut.done():
+                fut.set_exception(RuntimeError("request abandoned: {0!r}".format(e)))
+            raise
+        return fut
+
+    async def submit(self, method, params):
+        if method in INLINE:
+            self.requests += 1
+            return self.stats() if method == "stats" else run(method, params)
+        return await asyncio.shield(await self.enqueue(method, params))
+
+    def _restart(self, pool):
+        # a worker died (or sent back something unpicklable): replace the
+        # pool, once, so later requests don't all fail with BrokenProcessPool
+        from concurrent.futures import ProcessPoolExecutor
+        if self._pool is pool:
+            self.restarts += 1
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_warm)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self):
+        from concurrent.futures.process import BrokenProcessPool
+        loop = asyncio.get_running_loop()
+        while True:
+            method, params, fut = await self._queue.get()
+            pool = self._pool
+            try:
+                result = await loop.run_in_executor(pool, run, method, params)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._restart(pool)
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                if not fut.done():
+                    fut.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _reply(self, writer, rid, fut):
+        try:
+            out = {"id": rid, "result": await asyncio.shield(fut)}
+            self.completed += 1
+        except Exception as e:
+            out = {"id": rid, "error": "{0}: {1}".format(type(e).__name__, e)}
+            self.errors += 1
+        writer.write((json.dumps(out) + "\n").encode())
+        await writer.drain()
+
+    async def _serve(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                rid = None
+                fut = asyncio.get_running_loop().create_future()
+                try:
+                    req = json.loads(line)
+                    rid = req.get("id")
+                    method, params = req["method"], req.get("params", {})
+                except Exception as e:
+                    fut.set_exception(ValueError("bad request: {0}".format(e)))
+                else:
+                    if method not in INLINE:
+                        # waits here (and stops reading) while the queue is full
+                        fut = await self.enqueue(method, params)
+                    else:
+                        try:
+                            fut.set_result(await self.submit(method, params))
+                        except Exception as e:
+                            fut.set_exception(e)
+                task = asyncio.ensure_future(self._reply(writer, rid, fut))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+
+class Client:
+    """One connection to a SolveService; call() sends a request and waits."""
+
+    def __init__(self, path=None, host="127.0.0.1", port=None):
+        self.path = path
+        self.host = host
+        self.port = port
+        self._reader = self._writer = None
+        self._next_id = 0
+        self._lock = None
+
+    async def connect(self):
+        if self.path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._lock = asyncio.Lock()
+        return self
+
+    async def call(self, method, **params):
+        """Result of the request; raises RuntimeError with the service's error."""
+        async with self._lock:
+            self._next_id += 1
+            self._writer.write((json.dumps({"id": self._next_id, "method": method,
+                                            "params": params}) + "\n").encode())
+            await self._writer.drain()
+            out = json.loads(await self._reader.readline())
+        if "error" in out:
+            raise RuntimeError(out["error"])
+        return out["result"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="local integrate / enmpy solve service")
+    ap.add_argument("--socket", help="Unix socket path (default: TCP on localhost)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    ap.add_argument("--max-wait", type=float,
+                    help="reject requests held back this many seconds (default: wait)")
+    args = ap.parse_args(argv)
+
+    async def serve():
+        service = SolveService(args.workers, args.max_queue, args.max_wait)
+        server = await service.start(args.socket, port=args.port)
+        sys.stderr.write("listening on {0} with {1} workers\n".format(
+            args.socket or service.address, service.workers))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
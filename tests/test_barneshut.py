@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import barneshut
+import coulomb
+
+
+def _charges(dim, n=12000, m=400, seed=1):
+    rng = np.random.default_rng(seed)
+    q = rng.uniform(-1, 1, n) * 1e-9
+    pos = rng.random((n, dim))
+    tq = rng.uniform(-1, 1, m) * 1e-9
+    # test charges inside the cloud and around it
+    tpos = rng.random((m, dim)) * 1.4 - 0.2
+    return q, pos, tq, tpos
+
+
+def _scale(q, pos, tq, tpos):
+    # k |tc| sum |q_i| / r_i^2, the scale error_bound is relative to
+    d = tpos[:, None, :] - pos[None, :, :]
+    return coulomb.k * np.abs(tq) * (np.abs(q) / np.einsum("tsk,tsk->ts", d, d)).sum(axis=1)
+
+
+@pytest.mark.parametrize("dim", [2, 3])
+@pytest.mark.parametrize("theta", [0.3, 0.5, 0.7])
+def test_error_within_bound(dim, theta):
+    q, pos, tq, tpos = _charges(dim)
+    exact, _ = coulomb.net_forces(q, pos, tq, tpos)
+    tree, coincident = barneshut.net_forces(q, pos, tq, tpos, theta=theta)
+    err = np.linalg.norm(tree - exact, axis=1)
+    assert not coincident.any()
+    assert (err <= barneshut.error_bound(theta) * _scale(q, pos, tq, tpos)).all()
+
+
+def test_tol_picks_theta_within_tol():
+    q, pos, tq, tpos = _charges(3, m=200)
+    tol = 1e-2
+    theta = barneshut.theta_for_tol(tol)
+    assert barneshut.error_bound(theta) <= tol
+    exact, _ = coulomb.net_forces(q, pos, tq, tpos)
+    tree, _ = barneshut.net_forces(q, pos, tq, tpos, tol=tol)
+    assert (np.linalg.norm(tree - exact, axis=1) <= tol * _scale(q, pos, tq, tpos)).all()
+
+
+def test_error_bound_is_the_single_charge_worst_case():
+    # one unit charge at offset s from the expansion center, field point at
+    # distance 1; the truncated expansion against the exact field
+    theta = 0.5
+    g = np.linspace(0, np.pi, 721)
+    s = theta * np.stack([np.cos(g), np.sin(g), np.zeros_like(g)], axis=1)
+    r = np.array([1.0, 0.0, 0.0])
+    d = r - s
+    exact = d / np.linalg.norm(d, axis=1)[:, None] ** 3
+    rel = []
+    for si, ei in zip(s, exact):
+        tree = barneshut.Tree(np.ones(1), si[None, :])
+        tree.center[0] = 0.0
+        tree.P[0] = si
+        tree.M[0] = np.outer(si, si)
+        approx = tree._multipole(r[None, :], np.ones(1), np.zeros(1, dtype=int))[0]
+        rel.append(np.linalg.norm(approx - ei) / np.linalg.norm(ei))
+    assert max(rel) == pytest.approx(barneshut.error_bound(theta), rel=1e-9)
+    assert barneshut.error_bound(0.5) < 1
+
+
+def test_small_and_empty_sets():
+    q, pos, tq, tpos = _charges(2, n=50, m=10)
+    exact, _ = coulomb.net_forces(q, pos, tq, tpos)
+    F, _ = barneshut.net_forces(q, pos, tq, tpos)
+    np.testing.assert_array_equal(F, exact)
+
+    q, pos, _, _ = _charges(2, n=3000)
+    F, coincident = barneshut.net_forces(q, pos, [], np.zeros((0, 2)))
+    assert F.shape == (0, 2) and coincident.shape == (0,)
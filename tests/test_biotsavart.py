@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+import pytest
+
+import biotsavart as bs
+
+
+def _rel(a, b):
+    return abs(a - b) / abs(b)
+
+
+def test_long_wire():
+    # 2 km straight wire along z, field at its middle; the finite wire is
+    # short of the infinite one by a factor h / sqrt(h^2 + r^2) (the segment
+    # formula loses about (h/r)^2 * 1e-16 to cancellation at this length)
+    h = 1000.0
+    path = bs.line_path((0, 0, -h), (0, 0, h))
+    B = bs.path_field(path, 3.0, [[1.0, 0, 0], [0, 0.5, 0]])
+    for Bphi, r in ((B[0, 1], 1.0), (-B[1, 0], 0.5)):
+        assert _rel(Bphi, bs.wire_field(3.0, r) * h / math.hypot(h, r)) < 1e-9
+        assert _rel(Bphi, bs.wire_field(3.0, r)) < (r / h) ** 2
+    assert B[0, 0] == pytest.approx(0, abs=1e-20) and B[0, 2] == pytest.approx(0, abs=1e-20)
+
+
+def test_loop_center_and_axis():
+    R, I = 0.2, 5.0
+    path = bs.loop_path(R, n=2000)
+    z = np.array([0.0, 0.1, 0.5, -0.3])
+    B = bs.path_field(path, I, np.stack([np.zeros_like(z), np.zeros_like(z), z], axis=1))
+    assert _rel(B[0, 2], bs.loop_center_field(I, R)) < 1e-5
+    for Bz, zi in zip(B[:, 2], z):
+        assert _rel(Bz, bs.loop_axis_field(I, R, zi)) < 1e-5
+    np.testing.assert_allclose(B[:, :2], 0, atol=1e-12 * abs(B[0, 2]))
+
+
+def test_arc_center():
+    R, I, theta = 0.5, 2.0, 2 * math.pi / 3
+    B = bs.path_field(bs.arc_path(R, theta, n=2000), I, [0, 0, 0])
+    assert _rel(B[2], bs.arc_center_field(I, R, theta)) < 1e-5
+
+
+def test_helix_matches_finite_solenoid():
+    R, L, turns, I = 0.05, 1.0, 200, 1.5
+    n = turns / L
+    # inside the winding, where the helix is close to a current sheet
+    z = np.array([0.0, 0.2, 0.4, -0.3])
+    pts = np.stack([np.zeros_like(z), np.zeros_like(z), z], axis=1)
+    B = bs.path_field(bs.helix_path(R, L, turns), I, pts)
+    for Bz, zi in zip(B[:, 2], z):
+        assert _rel(Bz, bs.solenoid_axis_field(n, I, R, L, zi)) < 1e-4
+    # the middle of a long solenoid is close to the ideal one
+    assert _rel(B[0, 2], bs.solenoid_field(n, I)) < 2 * (R / L) ** 2
+
+
+def test_chunking_and_points_on_wire():
+    path = bs.helix_path(0.05, 0.2, 10, n_per_turn=32)
+    pts = np.random.default_rng(0).random((50, 3)) * 0.1
+    whole = bs.path_field(path, 1.0, pts)
+    chunked = bs.path_field(path, 1.0, pts, chunk_pairs=7)
+    np.testing.assert_allclose(chunked, whole, rtol=1e-12, atol=1e-20)
+    on = bs.path_field(path, 1.0, path[3:5])
+    assert np.isnan(on).all()
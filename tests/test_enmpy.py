@@ -0,0 +1,37 @@
+import json
+
+import enmpy
+
+GOOD = {"problem": "coulomb.force", "qA": 1e-6, "qB": 2e-6, "r": 0.1}
+# (-1)^0.5 makes the result complex
+COMPLEX = {"problem": "gauss.sphere.inside_power", "a": 1, "n": 0.5, "r": -1}
+
+
+def _batch(tmp_path, lines):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    src.write_text("".join(line + "\n" for line in lines))
+    counts = enmpy.batch(str(src), str(dst))
+    return counts, [json.loads(line) for line in dst.read_text().splitlines()]
+
+
+def test_complex_result_is_a_record_error(tmp_path):
+    counts, out = _batch(tmp_path, [json.dumps(COMPLEX), json.dumps(GOOD)])
+    assert counts == (1, 1)
+    assert out[0]["record"] == 1 and out[0]["error"].startswith("ValueError: no real result")
+    assert out[1]["record"] == 2 and abs(out[1]["result"] - 1.8) < 1e-12
+
+
+def test_unparseable_lines_do_not_stop_the_batch(tmp_path):
+    counts, out = _batch(tmp_path, [json.dumps(GOOD), '{"problem": oops', "5",
+                                    json.dumps(dict(GOOD, id=7))])
+    assert counts == (2, 2)
+    assert out[1]["error"].startswith("JSONDecodeError")
+    assert out[2]["error"].startswith("TypeError")
+    assert out[3]["id"] == 7 and "result" in out[3]
+
+
+def test_unserializable_result_is_an_error(monkeypatch):
+    monkeypatch.setitem(enmpy.PROBLEMS, "test.object", (lambda: object(), []))
+    out = list(enmpy.solve_stream([{"problem": "test.object"}, GOOD]))
+    assert out[0]["error"].startswith("TypeError")
+    assert "result" in out[1]
@@ -0,0 +1,77 @@
+import pytest
+
+import integralcalculator as ic
+
+# the demo integrands, plus the poly*exp, poly*trig and sum rules
+EXPRS = ["2*x", "x^2", "sin(x)*exp(x)", "ln(x)/x", "1/(x^2 + 1)", "sqrt(x)",
+         "root(3, x^2 + 1)", "-3*x^3 + 5*x - 1", "x*e^x", "1/x",
+         "(x^2 + 1)*e^(3*x)", "x^3*cos(2*x)", "x*sin(x) + e^(2*x) + x^4"]
+
+
+@pytest.mark.parametrize("expr", EXPRS)
+def test_simplify_policies_agree(expr):
+    sp = ic.sp
+    x = sp.Symbol("x")
+    results = {}
+    for policy in ic.SIMPLIFY_POLICIES:
+        integrand, F, _ = ic.integrate_string_with_steps(expr, cache=False, simplify=policy)
+        assert not F.has(sp.Integral)
+        # numerically: SymPy can't always simplify hyper() derivatives to 0
+        residual = sp.diff(F, x) - integrand
+        for x0 in (0.3, 0.7, 1.9):
+            assert abs(complex(sp.N(residual.subs(x, x0)))) < 1e-9
+        results[policy] = F
+    # antiderivatives may differ only by a constant
+    for policy in ("none", "always"):
+        assert sp.diff(sp.simplify(results[policy] - results["final"]), x) == 0
+
+
+def test_compiled_gaussian_antiderivative_takes_arrays():
+    # erf has no NumPy array version; compile_sympy falls back to mpmath
+    import math
+    import numpy as np
+    f, F = ic.compile_integral("exp(-x^2)")
+    x = np.array([0.0, 0.5, 1.0, 2.0])
+    expected = [math.sqrt(math.pi) / 2 * math.erf(v) for v in x]
+    np.testing.assert_allclose(F(x), expected, rtol=1e-14)
+    np.testing.assert_allclose(f(x), np.exp(-x * x))
+    res = ic.integrate_definite("exp(-x^2)", 0, x, method="symbolic")
+    assert res.symbolic.all()
+    np.testing.assert_allclose(res.values, expected, rtol=1e-14)
+
+
+def test_auto_definite_keeps_closed_form_on_wide_intervals():
+    # F(b) - F(a) is valid wherever F is continuous, however poorly a
+    # single quadrature pass resolves the interval
+    import math
+    import numpy as np
+    res = ic.integrate_definite("sin(x)", 0, 100)
+    assert res.symbolic.all() and res.values == pytest.approx(1 - math.cos(100), abs=1e-12)
+    res = ic.integrate_definite("x^3 + 2", -50, 80)
+    assert res.symbolic.all() and res.values == pytest.approx((80**4 - 50**4) / 4 + 260, rel=1e-15)
+    # across the pole of 1/x or tan(x) it falls back to quadrature
+    res = ic.integrate_definite("1/x", np.array([-1.0, 1.0]), np.array([1.0, 3.0]))
+    assert res.symbolic.tolist() == [False, True]
+    assert not ic.integrate_definite("tan(x)", 0, 2).symbolic.any()
+
+
+def _chunk_or_crash(chunk, *args):
+    # stands in for ic._integrate_chunk in the workers: "crash" kills one
+    import os
+    if any(ex == "crash" for _, ex in chunk):
+        os._exit(1)
+    return _integrate_chunk(chunk, *args)
+
+
+_integrate_chunk = ic._integrate_chunk
+
+
+def test_integrate_many_survives_a_dead_worker(monkeypatch):
+    monkeypatch.setattr(ic, "_integrate_chunk", _chunk_or_crash)
+    exprs = ["x", "x^2", "crash"] + [f"x^{n}" for n in range(3, 15)]
+    results = list(ic.integrate_many(exprs, workers=2, chunksize=1))
+    assert [r.index for r in results] == list(range(len(exprs)))
+    assert results[2].status == "error" and "BrokenProcessPool" in results[2].error
+    # only what was in flight with the crash fails; the rest ran in a new pool
+    assert all(r.ok for r in results[-6:])
+    assert sum(not r.ok for r in results) <= 4
@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+
+import particles
+
+# electrons and protons in a uniform 1 mT field along z
+Q = np.array([-1.602e-19, 1.602e-19, -1.602e-19])
+M = np.array([9.109e-31, 1.673e-27, 9.109e-31])
+SPEED = np.array([1e6, 1e5, 3e6])
+B = np.array([0.0, 0.0, 1e-3])
+STEPS = 2000
+
+
+def _start():
+    x = np.zeros((len(Q), 3))
+    v = np.zeros((len(Q), 3))
+    v[:, 0] = SPEED
+    return x, v
+
+
+def _one_period(i):
+    T = particles.gyro_period(M[i], Q[i], B[2])
+    x, v = _start()
+    return particles.push(x[i:i + 1], v[i:i + 1], Q[i], M[i], T / STEPS, STEPS, B=B)
+
+
+def test_orbit_radius():
+    # one period per particle; the orbit is a circle of radius mv/qB
+    for i in range(len(Q)):
+        _, _, X, _ = _one_period(i)
+        r = particles.gyro_radius(M[i], SPEED[i], Q[i], B[2])
+        xy = X[:-1, 0, :2]      # the last frame repeats the first
+        center = xy.mean(axis=0)
+        radii = np.linalg.norm(xy - center, axis=1)
+        assert abs(radii.mean() / r - 1) < 1e-5
+        assert radii.std() / r < 1e-5
+        assert np.abs(X[:, 0, 2]).max() == 0
+
+
+def test_period():
+    # after T = 2 pi m/qB the particle is back where it started, having
+    # turned through one full circle
+    for i in range(len(Q)):
+        x, v, X, _ = _one_period(i)
+        r = particles.gyro_radius(M[i], SPEED[i], Q[i], B[2])
+        assert np.linalg.norm(x[0]) < 1e-4 * r
+        np.testing.assert_allclose(v[0], [SPEED[i], 0, 0], atol=1e-5 * SPEED[i])
+        half = X[STEPS // 2, 0, :2]
+        assert abs(np.linalg.norm(half) / (2 * r) - 1) < 1e-5
+
+
+def test_batched_speed_and_sense():
+    # all particles at once, q and m per particle; a pure B field keeps
+    # |v| exactly and electrons and protons circle in opposite senses
+    T = particles.gyro_period(M[0], Q[0], B[2])
+    x, v = _start()
+    x, v, X, V = particles.push(x, v, Q, M, T / 100, 1000, B=B, every=10, save_v=True)
+    assert X.shape == V.shape == (101, len(Q), 3)
+    np.testing.assert_allclose(np.linalg.norm(V, axis=2), np.broadcast_to(SPEED, (101, 3)),
+                               rtol=1e-12)
+    # v x B with B along +z and v along +x points to -y: protons turn
+    # toward -y, electrons toward +y
+    x, v = _start()
+    _, v, _, _ = particles.push(x, v, Q, M, T / 100, 1, B=B)
+    assert math.copysign(1, v[1, 1]) == -1
+    assert math.copysign(1, v[0, 1]) == 1
+
+
+def test_memmap_output_matches(tmp_path):
+    x, v = _start()
+    T = particles.gyro_period(M[0], Q[0], B[2])
+    args = (Q, M, T / 500, 700)
+    _, _, X, V = particles.push(x, v, *args, B=B, every=3, save_v=True)
+    xp, vp = tmp_path / "x.npy", tmp_path / "v.npy"
+    _, _, Xm, Vm = particles.push(x, v, *args, B=B, every=3, x_path=str(xp), v_path=str(vp),
+                                  chunk_frames=16)
+    np.testing.assert_array_equal(np.load(xp), X)
+    np.testing.assert_array_equal(np.load(vp), V)
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+import service
+
+SLOW = "exp(x^3)*sin(x^2)*ln(x)"
+
+
+def _with_service(body, **kwargs):
+    # start a service on an ephemeral localhost port, run body(service, port)
+    async def main():
+        svc = service.SolveService(**kwargs)
+        await svc.start()
+        try:
+            return await body(svc, svc.address[1])
+        finally:
+            await svc.close()
+    return asyncio.run(main())
+
+
+async def _clients(port, n):
+    return [await service.Client(port=port).connect() for _ in range(n)]
+
+
+def test_identical_requests_are_coalesced():
+    async def body(svc, port):
+        a, b = await _clients(port, 2)
+        first = asyncio.ensure_future(a.call("integrate", expr=SLOW, timeout=1))
+        await asyncio.sleep(0.1)
+        second = await b.call("integrate", expr=SLOW, timeout=1)
+        assert await first == second
+        assert second["status"] == "timeout"
+        return svc.stats()
+    stats = _with_service(body, workers=1)
+    assert stats["coalesced"] == 1 and stats["completed"] == 2
+
+
+def test_full_queue_is_rejected():
+    async def body(svc, port):
+        a, b, c = await _clients(port, 3)
+        # one request on the only worker, one in the queue, one too many
+        busy = asyncio.ensure_future(a.call("integrate", expr=SLOW, timeout=1))
+        await asyncio.sleep(0.1)
+        queued = asyncio.ensure_future(b.call("integrate", expr=SLOW + " + 1", timeout=1))
+        await asyncio.sleep(0.1)
+        with pytest.raises(RuntimeError, match="queue full"):
+            await c.call("integrate", expr="x^2")
+        assert (await busy)["status"] == (await queued)["status"] == "timeout"
+        # there is room again
+        assert (await c.call("integrate", expr="x^2"))["antiderivative"] == "x**3/3"
+        return svc.stats()
+    stats = _with_service(body, workers=1, max_queue=1, max_wait=0)
+    assert stats["rejected"] == 1
+
+
+def test_integration_timeout_is_a_result():
+    async def body(svc, port):
+        c, = await _clients(port, 1)
+        out = await c.call("integrate", expr=SLOW, timeout=0.3)
+        assert out["status"] == "timeout" and out["error"]
+        assert (await c.call("integrate", expr="x*e^x"))["status"] == "ok"
+    _with_service(body, workers=1)
+
+
+def test_worker_crash_recovers():
+    async def body(svc, port):
+        c, = await _clients(port, 1)
+        crashed = asyncio.ensure_future(c.call("integrate", expr=SLOW, timeout=30))
+        await asyncio.sleep(0.3)
+        for pid in list(svc._pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        with pytest.raises(RuntimeError, match="BrokenProcessPool"):
+            await crashed
+        assert (await c.call("integrate", expr="x^2"))["status"] == "ok"
+        return svc.stats()
+    stats = _with_service(body, workers=1)
+    assert stats["restarts"] == 1 and stats["errors"] == 1